@@ -11,6 +11,70 @@ SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'django-insecure-default-key')
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Обработка силлабусов: по умолчанию в фоне, с ответом id задачи
+SYLLABUS_INGEST_ASYNC = os.getenv('SYLLABUS_INGEST_ASYNC', 'True') == 'True'
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', '2'))
+# Процесс отмечает свои выполняемые задачи раз в INGESTION_HEARTBEAT_SECONDS; задача без отметки
+# дольше INGESTION_STALE_SECONDS считается прерванной и возвращается в очередь при запуске сервера
+INGESTION_HEARTBEAT_SECONDS = int(os.getenv('INGESTION_HEARTBEAT_SECONDS', '30'))
+INGESTION_STALE_SECONDS = int(os.getenv('INGESTION_STALE_SECONDS', '120'))
+# Локальный разбор таблицы тематического плана без GPT; GPT нужен только без таблицы
+# или для генерации заданий
+SYLLABUS_LOCAL_PARSING = os.getenv('SYLLABUS_LOCAL_PARSING', 'True') == 'True'
+SYLLABUS_GENERATE_ASSIGNMENTS = os.getenv('SYLLABUS_GENERATE_ASSIGNMENTS', 'False') == 'True'
+# PDF: число процессов извлечения страниц и таймаут на одну страницу в секундах
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '4'))
+PDF_PAGE_TIMEOUT = int(os.getenv('PDF_PAGE_TIMEOUT', '30'))
+# Сколько PDF разбирается одновременно во всём процессе (всего процессов разбора — до PDF_WORKERS на каждый)
+PDF_MAX_CONCURRENT = int(os.getenv('PDF_MAX_CONCURRENT', '1'))
+
+# Кэш ответов GPT по хэшу текста силлабуса и версии промпта
+GPT_CACHE_ENABLED = os.getenv('GPT_CACHE_ENABLED', 'True') == 'True'
+GPT_CACHE_TTL_DAYS = int(os.getenv('GPT_CACHE_TTL_DAYS', '90'))
+
+# Режим структурирования: single — один запрос, sectioned — параллельно по секциям,
+# auto — посекционно для длинных текстов
+GPT_STRUCTURING_MODE = os.getenv('GPT_STRUCTURING_MODE', 'auto')
+GPT_SECTIONED_MIN_CHARS = int(os.getenv('GPT_SECTIONED_MIN_CHARS', '12000'))
+GPT_SECTION_WEEKS = int(os.getenv('GPT_SECTION_WEEKS', '5'))
+GPT_SECTION_CONCURRENCY = int(os.getenv('GPT_SECTION_CONCURRENCY', '4'))
+GPT_SECTION_RETRIES = int(os.getenv('GPT_SECTION_RETRIES', '2'))
+
+# Кэширование get_roadmap: max-age для клиентов и число сериализованных roadmap в памяти
+ROADMAP_CACHE_MAX_AGE = int(os.getenv('ROADMAP_CACHE_MAX_AGE', '60'))
+ROADMAP_CACHE_SIZE = int(os.getenv('ROADMAP_CACHE_SIZE', '256'))
+
+# Кэш статистики roadmap (число подтем по неделям) для расчёта прогресса: записи и секунды
+ROADMAP_STATS_CACHE_SIZE = int(os.getenv('ROADMAP_STATS_CACHE_SIZE', '4096'))
+ROADMAP_STATS_CACHE_TTL = int(os.getenv('ROADMAP_STATS_CACHE_TTL', '300'))
+
+# Максимум изменений прогресса в одном запросе синхронизации из приложения
+PROGRESS_SYNC_MAX_CHANGES = int(os.getenv('PROGRESS_SYNC_MAX_CHANGES', '1000'))
+
+# Автодополнение: индекс загружается при старте сервера и сверяется с версией каталога
+AUTOCOMPLETE_PRELOAD = os.getenv('AUTOCOMPLETE_PRELOAD', 'True') == 'True'
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', '30'))
+
+# Создавать индексы MongoDB при запуске сервера (см. manage.py ensure_indexes)
+MONGO_ENSURE_INDEXES_ON_STARTUP = os.getenv('MONGO_ENSURE_INDEXES_ON_STARTUP', 'True') == 'True'
+
+# Кэш проверенных JWT и профилей пользователей (секунды и число записей)
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '10000'))
+# Профиль, изменённый в другом процессе, виден здесь не позже чем через столько секунд
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '5'))
+
+# bcrypt: стоимость хэша, размер пула потоков и максимальная очередь задач
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '64'))
+# Ограничение попыток входа и регистрации в окне AUTH_RATE_LIMIT_WINDOW секунд (0 — без ограничения)
+AUTH_RATE_LIMIT_PER_IP = int(os.getenv('AUTH_RATE_LIMIT_PER_IP', '30'))
+AUTH_RATE_LIMIT_PER_USERNAME = int(os.getenv('AUTH_RATE_LIMIT_PER_USERNAME', '10'))
+AUTH_RATE_LIMIT_WINDOW = int(os.getenv('AUTH_RATE_LIMIT_WINDOW', '60'))
+# Брать IP клиента из X-Forwarded-For (только за доверенным прокси)
+AUTH_TRUST_X_FORWARDED_FOR = os.getenv('AUTH_TRUST_X_FORWARDED_FOR', 'False') == 'True'
+
 DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 # Исправлено: добавляем '127.0.0.1' и 'localhost' в ALLOWED_HOSTS
@@ -102,6 +166,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True  # Включить только для разработки
 CORS_ALLOW_CREDENTIALS = True
+# ETag нужен клиентам для условных запросов к roadmap
+CORS_EXPOSE_HEADERS = ['ETag']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
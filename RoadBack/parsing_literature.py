@@ -1,65 +1,6 @@
 import json
-from docx import Document
 
-
-def normalize_text(text: str) -> str:
-    """
-    Нормализует текст, убирая лишние пробелы и приводя к читаемому виду.
-    """
-    return '\n'.join(line.strip() for line in text.replace('\n', '\n').splitlines() if line.strip())
-
-
-def extract_literature_block(doc_path: str) -> dict:
-    """
-    Извлекает текст от 'Список литературы' до
-    'Политика академической честности и использование ИИ (AI)'.
-    Разделяет на 'Обязательная литература', 'Дополнительная литература' и 'Интернет-ресурсы'.
-
-    Args:
-        doc_path (str): Путь к DOCX-файлу.
-
-    Returns:
-        dict: Словарь с разделенной литературой.
-    """
-    doc = Document(doc_path)
-    result = {
-        "Обязательная литература": [],
-        "Дополнительная литература": [],
-        "Интернет-ресурсы": []
-    }
-    current_section = None
-    recording = False
-
-    for para in doc.paragraphs:
-        text = para.text.strip()
-
-        # Пропускаем пустые строки, пока не начали запись
-        if not recording:
-            if text == "Список литературы":
-                recording = True
-            continue
-
-        # Заканчиваем, если встретили конец блока
-        if text.startswith("Политика академической честности"):
-            break
-
-        # Определяем текущий раздел
-        if text in ["Обязательная литература", "Дополнительная литература", "Интернет-ресурсы"]:
-            current_section = text
-            continue
-
-        # Если есть текущий раздел, добавляем текст в соответствующую категорию
-        if current_section and text:
-            result[current_section].append(normalize_text(text))
-
-    # Форматируем результат
-    for key in result:
-        if result[key]:
-            result[key] = '\n'.join(result[key])
-        else:
-            result[key] = "Данные отсутствуют"
-
-    return result
+from roadmap.docx_parser import extract_literature_block
 
 
 if __name__ == "__main__":
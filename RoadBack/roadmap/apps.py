@@ -1,6 +1,52 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+SERVER_COMMANDS = ('runserver', 'gunicorn', 'uwsgi', 'daphne', 'uvicorn', 'hypercorn')
 
 
 class RoadmapConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'roadmap'
+
+    def ready(self):
+        # Индексы MongoDB, индекс автодополнения и прерванные задачи обработки
+        # готовятся в фоне при запуске сервера, не задерживая старт
+        if _is_server_process():
+            threading.Thread(target=_warm_up, daemon=True).start()
+
+
+def _is_server_process() -> bool:
+    command = ' '.join(sys.argv[:2])
+    if not any(name in command for name in SERVER_COMMANDS):
+        return False
+    # У runserver с автоперезагрузкой запросы обслуживает только дочерний процесс
+    if 'runserver' in command and '--noreload' not in sys.argv:
+        return os.environ.get('RUN_MAIN') == 'true'
+    return True
+
+
+def _warm_up():
+    from .db import db
+    if settings.MONGO_ENSURE_INDEXES_ON_STARTUP:
+        from .indexes import ensure_all_indexes, print_index_problems
+        try:
+            for collection_name, results in ensure_all_indexes(db).items():
+                print_index_problems(collection_name, results)
+        except Exception as e:
+            print(f"Не удалось создать индексы MongoDB: {str(e)}")
+    # Прерванные остановкой сервера задачи обработки возвращаются в очередь один раз при запуске
+    from .jobs import resume_pending_jobs
+    try:
+        resume_pending_jobs()
+    except Exception as e:
+        print(f"Не удалось возобновить задачи обработки: {str(e)}")
+    if settings.AUTOCOMPLETE_PRELOAD:
+        from .autocomplete import get_index
+        try:
+            get_index(db)
+        except Exception as e:
+            print(f"Не удалось загрузить индекс автодополнения: {str(e)}")
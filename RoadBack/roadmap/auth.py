@@ -0,0 +1,116 @@
+import asyncio
+import time
+from functools import wraps
+
+import jwt
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .db import db
+from .lru import LRUCache
+
+# Общая проверка JWT для API: токен проверяется один раз, пользователь читается
+# из короткоживущего кэша, и view получает его в request.auth_user.
+# invalidate_user сбрасывает кэш только своего процесса; в остальных процессах
+# изменения профиля (роль, имя, настройки) видны не позже AUTH_USER_CACHE_TTL секунд.
+
+JWT_ALGORITHM = 'HS256'
+
+# Пароль и прогресс по курсам не нужны для проверки доступа и в кэше не хранятся
+USER_PROJECTION = {'_id': 0, 'password': 0, 'user_progress': 0}
+
+_token_cache = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+_user_cache = LRUCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия токена; проверенные токены кэшируются до истечения exp.
+    Бросает jwt.ExpiredSignatureError и jwt.InvalidTokenError.
+    """
+    cached = _token_cache.get(token)
+    if cached is not None:
+        payload, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return payload
+        _token_cache.pop(token)
+        raise jwt.ExpiredSignatureError('Signature has expired')
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    _token_cache.set(token, (payload, payload.get('exp')))
+    return payload
+
+
+def get_user(username: str):
+    """
+    Пользователь без пароля и прогресса (копия, её можно изменять) или None.
+    """
+    user = _user_cache.get(username)
+    if user is None:
+        user = db['users'].find_one({'username': username}, USER_PROJECTION)
+        if user is None:
+            return None
+        _user_cache.set(username, user)
+    return dict(user)
+
+
+def invalidate_user(*usernames):
+    """
+    Сбрасывает кэш пользователя после изменения профиля (и старого имени при переименовании).
+    Действует только в текущем процессе, см. AUTH_USER_CACHE_TTL.
+    """
+    for username in usernames:
+        if username:
+            _user_cache.pop(username)
+
+
+def _authenticate(request):
+    """
+    (пользователь, None) для верного заголовка 'Authorization: Bearer <token>',
+    иначе (None, ответ с ошибкой).
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, JsonResponse({'error': 'Not authenticated'}, status=401)
+    token = auth_header.split(' ')[1]
+    try:
+        payload = decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return None, JsonResponse({'error': 'Token expired'}, status=401)
+    except jwt.InvalidTokenError as e:
+        return None, JsonResponse({'error': 'Invalid token: ' + str(e)}, status=401)
+    username = payload.get('username')
+    if not isinstance(username, str) or not username:
+        return None, JsonResponse({'error': 'Invalid token: username missing'}, status=401)
+    user = get_user(username)
+    if not user:
+        return None, JsonResponse({'error': 'User not found'}, status=404)
+    return user, None
+
+
+_authenticate_async = sync_to_async(_authenticate, thread_sensitive=False)
+
+
+def jwt_required(view):
+    """
+    Декоратор view (обычной или async): проверяет заголовок 'Authorization: Bearer <token>'
+    и кладёт пользователя в request.auth_user. Ставится под @csrf_exempt.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            user, error = await _authenticate_async(request)
+            if error:
+                return error
+            request.auth_user = user
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        user, error = _authenticate(request)
+        if error:
+            return error
+        request.auth_user = user
+        return view(request, *args, **kwargs)
+    return wrapper
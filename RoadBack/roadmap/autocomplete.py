@@ -0,0 +1,182 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from .catalog import catalog_version
+
+# Автодополнение для строки поиска: отсортированные массивы ключей в памяти процесса
+# по названиям предметов, темам недель и подтемам. Каждая фраза индексируется
+# с начала каждого слова, поэтому «мод» находит и «Модуль 1», и «Введение в модули».
+# Поиск по префиксу — двоичный поиск и короткий просмотр соседних ключей.
+
+# Порядок выдачи: сначала предметы, затем темы недель, затем подтемы
+KIND_PRIORITY = {'subject': 0, 'week': 1, 'subtopic': 2}
+# Сколько совпадений одного вида просматривается для ранжирования перед отбором top-k
+MAX_SCANNED = 200
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+INDEX_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'roadmap.subject.label': 1,
+    'roadmap.weeks.main_topic': 1,
+    'roadmap.subtopics.label': 1,
+}
+
+
+def fold(text: str) -> str:
+    """
+    Ключ сравнения: без учёта регистра, ё = е, пробелы схлопнуты.
+    """
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def _phrases(syllabus_id: str, roadmap: dict):
+    subject = roadmap.get('subject', {})
+    yield subject.get('label', ''), 'subject', syllabus_id
+    for week in roadmap.get('weeks', []):
+        yield week.get('main_topic', ''), 'week', syllabus_id
+    for subtopic in roadmap.get('subtopics', []):
+        yield subtopic.get('label', ''), 'subtopic', syllabus_id
+
+
+def _entries(syllabus_id: str, roadmap: dict) -> list:
+    """
+    Записи (ключ, текст, вид, id силлабуса) для всех начал слов каждой фразы.
+    """
+    entries = set()
+    for text, kind, sid in _phrases(syllabus_id, roadmap):
+        text = ' '.join(str(text or '').split())
+        folded = fold(text)
+        if not folded:
+            continue
+        words = folded.split(' ')
+        for idx in range(len(words)):
+            entries.add((' '.join(words[idx:]), text, kind, sid))
+    return list(entries)
+
+
+class PrefixIndex:
+    """
+    Отдельный отсортированный массив записей (ключ, текст, id силлабуса) на каждый вид,
+    чтобы совпадения с подтемами не вытесняли предметы из просмотра. Силлабус
+    обновляется вставкой и удалением своих записей (bisect), без пересборки массивов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {kind: [] for kind in KIND_PRIORITY}
+        self._by_syllabus = {}
+        self.loaded = False
+        self.version = None
+        self.checked_at = 0.0
+
+    def load(self, db):
+        # Версия читается до документов: запись, попавшая между ними, вызовет повторную загрузку
+        version = catalog_version(db)
+        entries = {kind: [] for kind in KIND_PRIORITY}
+        by_syllabus = {}
+        for syllabus in db['syllabus'].find({}, INDEX_PROJECTION):
+            if syllabus.get('id'):
+                syllabus_entries = _entries(syllabus['id'], syllabus.get('roadmap', {}))
+                by_syllabus[syllabus['id']] = syllabus_entries
+                for key, text, kind, syllabus_id in syllabus_entries:
+                    entries[kind].append((key, text, syllabus_id))
+        for kind_entries in entries.values():
+            kind_entries.sort()
+        with self._lock:
+            self._entries, self._by_syllabus = entries, by_syllabus
+            self.version = version
+            self.loaded = True
+            self.checked_at = time.monotonic()
+
+    def update_syllabi(self, saved: list, version: int = None):
+        """
+        Заменяет записи силлабусов из saved — списка (id, roadmap), roadmap None означает
+        удаление силлабуса; до первой загрузки индекса ничего не делает. version — версия каталога после этой записи: если она
+        следующая за версией индекса, изменений из других процессов между ними не было,
+        и индекс считается актуальным без перезагрузки.
+        """
+        if not self.loaded:
+            return
+        new_entries = {syllabus_id: _entries(syllabus_id, roadmap) if roadmap is not None else []
+                       for syllabus_id, roadmap in saved}
+        with self._lock:
+            for syllabus_id, entries in new_entries.items():
+                for key, text, kind, sid in self._by_syllabus.pop(syllabus_id, []):
+                    kind_entries = self._entries[kind]
+                    idx = bisect_left(kind_entries, (key, text, sid))
+                    if idx < len(kind_entries) and kind_entries[idx] == (key, text, sid):
+                        del kind_entries[idx]
+                for key, text, kind, sid in entries:
+                    insort(self._entries[kind], (key, text, sid))
+                if entries:
+                    self._by_syllabus[syllabus_id] = entries
+            if version is not None and self.version == version - 1:
+                self.version = version
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_SUGGESTIONS) -> list:
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        suggestions = []
+        seen = set()
+        # Виды просматриваются по приоритету, пока не наберётся limit подсказок
+        for kind in sorted(KIND_PRIORITY, key=KIND_PRIORITY.get):
+            candidates = []
+            with self._lock:
+                kind_entries = self._entries[kind]
+                start = bisect_left(kind_entries, (prefix,))
+                for key, text, syllabus_id in kind_entries[start:start + MAX_SCANNED]:
+                    if not key.startswith(prefix):
+                        break
+                    # Совпадение с началом всей фразы важнее совпадения с серединой
+                    candidates.append((key != fold(text), len(text), text, syllabus_id))
+            candidates.sort()
+            for _, _, text, syllabus_id in candidates:
+                folded = fold(text)
+                if folded in seen:
+                    continue
+                seen.add(folded)
+                suggestions.append({'text': text, 'kind': kind, 'syllabus_id': syllabus_id})
+                if len(suggestions) == limit:
+                    return suggestions
+        return suggestions
+
+
+_index = PrefixIndex()
+_load_lock = threading.Lock()
+
+
+def get_index(db) -> PrefixIndex:
+    """
+    Индекс процесса: загружается при первом обращении и перечитывается, если каталог
+    изменили в другом процессе (версия каталога проверяется не чаще раза в
+    AUTOCOMPLETE_REFRESH_SECONDS секунд).
+    """
+    if not _index.loaded:
+        with _load_lock:
+            if not _index.loaded:
+                _index.load(db)
+        return _index
+    if time.monotonic() - _index.checked_at >= settings.AUTOCOMPLETE_REFRESH_SECONDS:
+        _index.checked_at = time.monotonic()
+        if catalog_version(db) != _index.version:
+            with _load_lock:
+                _index.load(db)
+    return _index
+
+
+def index_syllabi(saved: list, catalog_version: int = None):
+    """
+    Вызывается после сохранения силлабусов, чтобы подсказки обновились сразу.
+    saved — список (id, roadmap), catalog_version — версия каталога после записи.
+    """
+    _index.update_syllabi(saved, catalog_version)
+
+
+def suggest(db, prefix: str, limit: int = DEFAULT_SUGGESTIONS) -> list:
+    return get_index(db).suggest(prefix, max(1, min(limit, MAX_SUGGESTIONS)))
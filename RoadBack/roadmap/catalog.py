@@ -0,0 +1,129 @@
+import json
+
+from pymongo import ReturnDocument, UpdateOne
+
+from .indexes import ensure_indexes_once
+from .lru import LRUCache
+
+# Каталог предметов для get_subjects: краткие записи в отдельной коллекции,
+# которые обновляются при сохранении и удалении силлабуса. Готовый JSON каталога хранится
+# в памяти процесса и пересобирается, только когда меняется версия каталога.
+
+CATALOG_COLLECTION = 'syllabus_catalog'
+META_COLLECTION = 'catalog_meta'
+META_ID = 'catalog'
+
+SUMMARY_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'roadmap_version': 1,
+    'roadmap.subject.label': 1,
+    'roadmap.subject.description': 1,
+    'roadmap.subject.progress': 1,
+}
+
+# Сериализованные записи по (id, roadmap_version) и собранный ответ по версии каталога
+_entry_cache = LRUCache(maxsize=10000)
+_response_cache = LRUCache(maxsize=1)
+
+
+def _summary(syllabus: dict) -> dict:
+    subject = syllabus.get('roadmap', {}).get('subject', {})
+    return {
+        'id': syllabus['id'],
+        'title': subject.get('label', ''),
+        'description': subject.get('description', ''),
+        'progress': subject.get('progress', 0),
+        'roadmap_version': syllabus.get('roadmap_version', 0),
+    }
+
+
+def catalog_version(db) -> int:
+    meta = db[META_COLLECTION].find_one({'_id': META_ID}, {'version': 1})
+    return meta['version'] if meta else 0
+
+
+def _bump_version(db) -> int:
+    meta = db[META_COLLECTION].find_one_and_update(
+        {'_id': META_ID}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER)
+    return meta['version']
+
+
+def update_catalog_entries(db, syllabus_ids: list):
+    """
+    Обновляет записи каталога для сохранённых силлабусов. Версия каталога
+    увеличивается, только если какая-то запись действительно изменилась.
+    Возвращает новую версию каталога или None, если она не менялась.
+    """
+    if not syllabus_ids:
+        return None
+    syllabi = db['syllabus'].find({'id': {'$in': list(syllabus_ids)}}, SUMMARY_PROJECTION)
+    operations = [UpdateOne({'id': summary['id']}, {'$set': summary}, upsert=True)
+                  for summary in map(_summary, syllabi)]
+    if not operations:
+        return None
+    result = db[CATALOG_COLLECTION].bulk_write(operations, ordered=False)
+    if result.modified_count or result.upserted_count:
+        return _bump_version(db)
+    return None
+
+
+def remove_catalog_entries(db, syllabus_ids: list):
+    """
+    Убирает из каталога удалённые силлабусы. Возвращает новую версию каталога
+    или None, если таких записей не было.
+    """
+    if not syllabus_ids:
+        return None
+    result = db[CATALOG_COLLECTION].delete_many({'id': {'$in': list(syllabus_ids)}})
+    if result.deleted_count:
+        return _bump_version(db)
+    return None
+
+
+def rebuild_catalog(db):
+    """
+    Заполняет каталог по всей коллекции syllabus (первый запуск на существующих данных)
+    и убирает записи силлабусов, удалённых из неё напрямую.
+    """
+    ensure_indexes_once(db, CATALOG_COLLECTION)
+    ids = [doc['id'] for doc in db['syllabus'].find({}, {'_id': 0, 'id': 1}) if doc.get('id')]
+    update_catalog_entries(db, ids)
+    stale = set(db[CATALOG_COLLECTION].distinct('id')) - set(ids)
+    remove_catalog_entries(db, stale)
+    if not db[META_COLLECTION].find_one({'_id': META_ID}):
+        _bump_version(db)
+
+
+def _serialize_entry(summary: dict) -> bytes:
+    key = (summary['id'], summary.get('roadmap_version', 0))
+    body = _entry_cache.get(key)
+    if body is None:
+        body = json.dumps({
+            'id': summary['id'],
+            'title': summary['title'],
+            'description': summary['description'],
+            'progress': summary.get('progress', 0),
+        }).encode('utf-8')
+        _entry_cache.set(key, body)
+    return body
+
+
+def get_catalog_json(db) -> bytes:
+    """
+    JSON-ответ get_subjects в виде байтов. Пока версия каталога не изменилась,
+    возвращается готовый ответ из памяти; при изменении заново сериализуются
+    только записи с новой версией силлабуса.
+    """
+    version = catalog_version(db)
+    if not version:
+        rebuild_catalog(db)
+        version = catalog_version(db)
+    body = _response_cache.get(version)
+    if body is not None:
+        return body
+
+    entries = db[CATALOG_COLLECTION].find({}, {'_id': 0}).sort('_id', 1)
+    body = b'{"subjects": [' + b', '.join(_serialize_entry(entry) for entry in entries) + b']}'
+    _response_cache.set(version, body)
+    return body
@@ -0,0 +1,261 @@
+import os
+import re
+from typing import List, Dict, Any
+
+from .docx_stream import load_content
+from .structure import assemble_roadmap
+
+# Детерминированный разбор DOCX-силлабуса без обращения к GPT:
+# таблица тематического плана, блок литературы и описание курса.
+
+# Ожидаемые заголовки таблицы тематического плана
+THEMATIC_PLAN_HEADERS = ["неделя",
+                         "тема / модуль",
+                         "задания", "результат обучения",
+                         "литература",
+                         "структура оценок"
+                         ]
+
+LITERATURE_SECTIONS = ["Обязательная литература", "Дополнительная литература", "Интернет-ресурсы"]
+
+NO_DATA = "Нет данных"
+
+WEEK_RANGE_RE = re.compile(r'(\d{1,2})\s*[-–—]\s*(\d{1,2})')
+NUMBER_RE = re.compile(r'\d{1,2}')
+QUOTED_RE = re.compile(r'[«"“]([^»"”]{2,200})[»"”]')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормализует текст, убирая лишние пробелы и приводя к читаемому виду.
+    """
+    return '\n'.join(line.strip() for line in text.replace('\n', '\n').splitlines() if line.strip())
+
+
+def parse_thematic_plan(content_or_path) -> List[Dict[str, Any]]:
+    """
+    Извлекает строки таблицы 'Тематический план по неделям' как словари {заголовок: текст}.
+    Таблица ищется среди таблиц, следующих за заголовком.
+    """
+    content = load_content(content_or_path)
+
+    target_table = None
+    anchor = content.find_block("тематический план по неделям")
+    if anchor != -1:
+        for table in content.tables_after(anchor):
+            if not table.rows:
+                continue
+            headers = [normalize_text(cell.text) for cell in table.rows[0].grid_cells]
+            if len(headers) == 6 and all(
+                    any(exp_header in header.lower() for exp_header in THEMATIC_PLAN_HEADERS) for header in headers):
+                target_table = table
+                break
+
+    if not target_table:
+        raise ValueError(
+            "Таблица 'Тематический план по неделям' не найдена или не соответствует ожидаемой структуре.")
+
+    # Извлечение заголовков из первой строки таблицы
+    headers = [cell.text.strip() for cell in target_table.rows[0].grid_cells]
+
+    thematic_plan = []
+
+    # Парсинг строк таблицы (начиная со второй строки)
+    for row in target_table.rows[1:]:
+        row_data = {}
+        for idx, cell in enumerate(row.grid_cells[:len(headers)]):
+            text = normalize_text(cell.text)
+            row_data[headers[idx]] = text if text else NO_DATA
+
+        # Обработка объединенных ячеек (если "Неделя" пустая, берем из предыдущей строки)
+        if row_data.get(headers[0], NO_DATA) == NO_DATA and thematic_plan:
+            row_data[headers[0]] = thematic_plan[-1][headers[0]]
+
+        thematic_plan.append(row_data)
+
+    return thematic_plan
+
+
+def extract_literature_block(content_or_path) -> dict:
+    """
+    Извлекает текст от 'Список литературы' до
+    'Политика академической честности и использование ИИ (AI)'.
+    Разделяет на 'Обязательная литература', 'Дополнительная литература' и 'Интернет-ресурсы'.
+    """
+    content = load_content(content_or_path)
+    result = {section: [] for section in LITERATURE_SECTIONS}
+    current_section = None
+    recording = False
+
+    for para in content.paragraphs:
+        text = para.text.strip()
+
+        # Пропускаем строки, пока не начали запись
+        if not recording:
+            if text == "Список литературы":
+                recording = True
+            continue
+
+        # Заканчиваем, если встретили конец блока
+        if text.startswith("Политика академической честности"):
+            break
+
+        # Определяем текущий раздел
+        if text in LITERATURE_SECTIONS:
+            current_section = text
+            continue
+
+        if current_section and text:
+            result[current_section].append(normalize_text(text))
+
+    for key in result:
+        if result[key]:
+            result[key] = '\n'.join(result[key])
+        else:
+            result[key] = "Данные отсутствуют"
+
+    return result
+
+
+def extract_course_description(content_or_path) -> str:
+    """
+    Текст раздела 'Краткое описание курса' до цели курса или тематического плана.
+    """
+    content = load_content(content_or_path)
+    lines = []
+    recording = False
+    for para in content.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        if not recording:
+            if "Краткое описание курса" in text:
+                recording = True
+                _, _, rest = text.partition(':')
+                if rest.strip():
+                    lines.append(rest.strip())
+            continue
+        if text.startswith(("Цель курса", "Ожидаемые результаты", "Методы обучения")) or \
+                "тематический план по неделям" in text.lower():
+            break
+        lines.append(text)
+    return '\n'.join(lines)
+
+
+def extract_subject_label(content_or_path, file_path: str = '') -> str:
+    """
+    Название предмета: из кавычек в шапке документа ('дисциплина «Философия»'),
+    иначе из имени файла ('Силлабус_Философия_2024-2025.docx').
+    """
+    content = load_content(content_or_path)
+    file_path = file_path or content.file_path
+    for para in content.paragraphs[:30]:
+        text = para.text.strip()
+        lowered = text.lower()
+        if 'дисциплин' in lowered or 'силлабус' in lowered or 'курс' in lowered:
+            match = QUOTED_RE.search(text)
+            if match:
+                return match.group(1).strip()
+
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    parts = [part for part in re.split(r'[_\s]+', stem)
+             if part and part.lower() not in ('силлабус', 'syllabus') and not re.match(r'^\d{4}(-\d{4})?$', part)]
+    if parts:
+        return ' '.join(parts)
+    raise ValueError("Не удалось определить название предмета")
+
+
+def expand_week_range(value: str) -> List[int]:
+    """
+    Превращает значение ячейки 'Неделя' в список номеров: '1-3' -> [1, 2, 3], '4, 5' -> [4, 5].
+    """
+    weeks = []
+    for first, last in WEEK_RANGE_RE.findall(value):
+        first, last = int(first), int(last)
+        if first <= last:
+            weeks.extend(range(first, last + 1))
+    value = WEEK_RANGE_RE.sub(' ', value)
+    weeks.extend(int(number) for number in NUMBER_RE.findall(value))
+    return sorted(set(week for week in weeks if week > 0))
+
+
+def _cell(row: dict, header: str) -> str:
+    for key, value in row.items():
+        if header in key.lower():
+            return '' if value in (NO_DATA, "Данные отсутствуют") else value
+    return ''
+
+
+def _split_evenly(items: list, parts: int) -> List[list]:
+    size, extra = divmod(len(items), parts)
+    chunks = []
+    start = 0
+    for idx in range(parts):
+        end = start + size + (1 if idx < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+
+def convert_to_roadmap_structure(thematic_plan: List[Dict[str, Any]], subject: dict = None,
+                                 literature: dict = None) -> dict:
+    """
+    Строит объект roadmap из строк тематического плана.
+    Диапазоны недель ('1-3') разворачиваются в отдельные недели с общей темой,
+    а подтемы из ячейки 'Тема / модуль' распределяются между ними по порядку.
+    Задания берутся из колонки 'Задания'; генерация заданий через GPT выполняется отдельно.
+    """
+    subject = subject or {'label': 'Курс', 'description': ''}
+    default_material = (literature or {}).get("Обязательная литература", '')
+    if default_material == "Данные отсутствуют":
+        default_material = ''
+
+    weeks_by_number = {}
+    subtopics_by_week = {}
+    for row in thematic_plan:
+        week_numbers = expand_week_range(_cell(row, 'неделя'))
+        topic_lines = _cell(row, 'тема').splitlines()
+        if not week_numbers or not topic_lines:
+            continue
+
+        main_topic = topic_lines[0]
+        labels = topic_lines[1:] or [main_topic]
+        outcome = _cell(row, 'результат обучения')
+        details = {
+            'description': outcome,
+            'material': _cell(row, 'литература') or default_material,
+            'assignment': _cell(row, 'задания'),
+        }
+
+        if len(labels) >= len(week_numbers):
+            chunks = _split_evenly(labels, len(week_numbers))
+        else:
+            chunks = [labels] * len(week_numbers)
+        for number, chunk in zip(week_numbers, chunks):
+            # Строки одной недели (лекция, семинар) дополняют друг друга
+            week = weeks_by_number.setdefault(number, {'main_topic': main_topic, 'description': outcome})
+            if outcome and outcome not in week['description']:
+                week['description'] = '\n'.join(filter(None, [week['description'], outcome]))
+            for label in chunk:
+                subtopics_by_week.setdefault(number, []).append({'label': label, **details})
+
+    if not weeks_by_number:
+        raise ValueError("В тематическом плане не найдено ни одной недели")
+
+    return assemble_roadmap(subject, weeks_by_number, subtopics_by_week)
+
+
+def parse_syllabus_locally(content_or_path, original_name: str = None) -> dict:
+    """
+    Полностью локальный разбор силлабуса: документ читается один раз,
+    структура roadmap строится из таблицы плана без обращения к GPT.
+    original_name — имя файла для названия предмета, если оно отличается от пути на диске.
+    Бросает ValueError, если таблица тематического плана не найдена.
+    """
+    content = load_content(content_or_path)
+    thematic_plan = parse_thematic_plan(content)
+    subject = {
+        'label': extract_subject_label(content, file_path=original_name or ''),
+        'description': extract_course_description(content),
+    }
+    return convert_to_roadmap_structure(thematic_plan, subject, extract_literature_block(content))
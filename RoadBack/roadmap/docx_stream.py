@@ -0,0 +1,209 @@
+import zipfile
+from typing import List, Optional
+
+from lxml import etree
+
+# Потоковое чтение DOCX: word/document.xml разбирается за один проход через
+# lxml.iterparse без построения объектной модели python-docx. Обработанные
+# элементы сразу удаляются из дерева, поэтому память не растёт с размером документа.
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W = '{%s}' % W_NS
+
+W_BODY = W + 'body'
+W_P = W + 'p'
+W_TBL = W + 'tbl'
+W_TR = W + 'tr'
+W_TC = W + 'tc'
+W_T = W + 't'
+W_TAB = W + 'tab'
+W_BR = W + 'br'
+W_CR = W + 'cr'
+W_VAL = W + 'val'
+
+DOCUMENT_PART = 'word/document.xml'
+
+
+class Paragraph:
+    __slots__ = ('text', 'style', 'is_heading')
+
+    def __init__(self, text: str, style: str = '', is_heading: bool = False):
+        self.text = text
+        self.style = style
+        self.is_heading = is_heading
+
+
+class Cell:
+    """
+    Ячейка таблицы в том виде, в каком она записана в XML: объединённая ячейка
+    встречается один раз, с grid_span по горизонтали и v_merge по вертикали.
+    """
+    __slots__ = ('paragraphs', 'grid_span', 'v_merge')
+
+    def __init__(self, paragraphs: List[str], grid_span: int = 1, v_merge: Optional[str] = None):
+        self.paragraphs = paragraphs
+        self.grid_span = grid_span
+        self.v_merge = v_merge
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self.paragraphs)
+
+
+class Row:
+    """
+    cells — уникальные ячейки строки; grid_cells — ячейки по позициям сетки,
+    как их возвращает row.cells в python-docx (объединённая ячейка повторяется).
+    """
+    __slots__ = ('cells', 'grid_cells')
+
+    def __init__(self, cells: List[Cell], grid_cells: List[Cell]):
+        self.cells = cells
+        self.grid_cells = grid_cells
+
+
+class Table:
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: List[Row]):
+        self.rows = rows
+
+
+class DocxContent:
+    """
+    Результат одного прохода по документу: блоки в порядке следования
+    (Paragraph и Table), отдельные списки абзацев и таблиц и якоря заголовков.
+    """
+
+    def __init__(self, blocks: list, file_path: str = ''):
+        self.file_path = file_path
+        self.blocks = blocks
+        self.paragraphs = [block for block in blocks if isinstance(block, Paragraph)]
+        self.tables = [block for block in blocks if isinstance(block, Table)]
+        self.headings = [(idx, block.text) for idx, block in enumerate(blocks)
+                         if isinstance(block, Paragraph) and block.is_heading]
+
+    def find_block(self, marker: str, start: int = 0) -> int:
+        """
+        Индекс первого абзаца, содержащего marker (без учёта регистра), или -1.
+        """
+        marker = marker.lower()
+        for idx in range(start, len(self.blocks)):
+            block = self.blocks[idx]
+            if isinstance(block, Paragraph) and marker in block.text.lower():
+                return idx
+        return -1
+
+    def tables_after(self, idx: int):
+        return (block for block in self.blocks[idx + 1:] if isinstance(block, Table))
+
+    def full_text(self) -> str:
+        """
+        Весь текст документа независимо от формата: непустые абзацы, затем ячейки таблиц.
+        """
+        lines = [para.text.strip() for para in self.paragraphs if para.text.strip()]
+        for table in self.tables:
+            for row in table.rows:
+                lines.extend(cell.text for cell in row.grid_cells if cell.text)
+        return '\n'.join(lines)
+
+
+def _attr(parent, path: str):
+    node = parent.find(path)
+    if node is None:
+        return None
+    return node.get(W_VAL)
+
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for node in p.iter(W_T, W_TAB, W_BR, W_CR):
+        if node.tag == W_T:
+            parts.append(node.text or '')
+        elif node.tag == W_TAB:
+            parts.append('\t')
+        else:
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def _paragraph(p) -> Paragraph:
+    style = _attr(p, f'{W}pPr/{W}pStyle') or ''
+    outline = _attr(p, f'{W}pPr/{W}outlineLvl')
+    lowered = style.lower()
+    is_heading = outline is not None or lowered.startswith(('heading', 'title')) or style.isdigit()
+    return Paragraph(_paragraph_text(p), style, is_heading)
+
+
+def _table(tbl) -> Table:
+    rows = []
+    # Для вертикально объединённых ячеек: позиция сетки -> верхняя ячейка
+    merged_above = {}
+    for tr in tbl.iterchildren(W_TR):
+        cells = []
+        grid_cells = []
+        for tc in tr.iterchildren(W_TC):
+            span = int(_attr(tc, f'{W}tcPr/{W}gridSpan') or 1)
+            v_merge_node = tc.find(f'{W}tcPr/{W}vMerge')
+            v_merge = None
+            if v_merge_node is not None:
+                v_merge = v_merge_node.get(W_VAL) or 'continue'
+            paragraphs = [_paragraph_text(p).strip() for p in tc.iterchildren(W_P)]
+            cell = Cell([text for text in paragraphs if text], span, v_merge)
+
+            position = len(grid_cells)
+            if v_merge == 'continue' and position in merged_above:
+                grid_cell = merged_above[position]
+            else:
+                cells.append(cell)
+                grid_cell = cell
+                if v_merge == 'restart':
+                    merged_above[position] = cell
+                else:
+                    merged_above.pop(position, None)
+            grid_cells.extend([grid_cell] * span)
+        rows.append(Row(cells, grid_cells))
+    return Table(rows)
+
+
+def iter_docx_blocks(file_path: str):
+    """
+    Генератор блоков верхнего уровня документа (Paragraph и Table) в порядке следования.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open(DOCUMENT_PART) as part:
+            table_depth = 0
+            for event, elem in etree.iterparse(part, events=('start', 'end'), tag=(W_P, W_TBL)):
+                if elem.tag == W_TBL:
+                    table_depth += 1 if event == 'start' else -1
+                if event == 'start':
+                    continue
+                parent = elem.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue
+                if elem.tag == W_P and table_depth == 0:
+                    yield _paragraph(elem)
+                elif elem.tag == W_TBL and table_depth == 0:
+                    yield _table(elem)
+                else:
+                    continue
+                # Освобождаем обработанный элемент и всё, что было до него
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+
+def read_docx(file_path: str) -> DocxContent:
+    """
+    Читает документ за один проход; результат можно передавать всем извлекателям.
+    """
+    return DocxContent(list(iter_docx_blocks(file_path)), file_path)
+
+
+def load_content(content_or_path) -> DocxContent:
+    """
+    Принимает путь к DOCX или уже прочитанный DocxContent, чтобы файл разбирался один раз.
+    """
+    if isinstance(content_or_path, DocxContent):
+        return content_or_path
+    return read_docx(content_or_path)
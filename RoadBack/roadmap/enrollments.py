@@ -0,0 +1,280 @@
+import time
+
+from pymongo import ASCENDING, UpdateOne
+
+from .roadmap_stats import get_stats, week_progress
+
+# Курсы пользователя: прогресс из users.user_progress соединяется с силлабусами
+# на стороне MongoDB одним aggregate ($lookup по уникальному индексу syllabus.id),
+# и в ответ попадают только поля карточки курса.
+
+COURSE_FIELDS = {
+    '_id': 0,
+    'id': '$syllabus.id',
+    'title': '$syllabus.roadmap.subject.label',
+    'description': '$syllabus.roadmap.subject.description',
+    'upload_date': '$syllabus.upload_date',
+    'week_count': '$syllabus.week_count',
+    'progress': {'$ifNull': ['$user_progress.progress', 0]},
+    # stats считаются при загрузке; у старых документов — по списку подтем
+    'total_topics': {'$ifNull': ['$syllabus.stats.total_subtopics',
+                                 {'$size': {'$ifNull': ['$syllabus.roadmap.subtopics', []]}}]},
+    'completed_count': {'$size': {'$ifNull': ['$user_progress.completed_topics', []]}},
+    'user_progress': 1,
+}
+
+
+def enrolled_courses(db, username: str, include_roadmap: bool = False, include_weeks: bool = False) -> list:
+    """
+    Курсы, на которые записан пользователь, в порядке записи. Полный roadmap
+    добавляется только при include_roadmap, прогресс по неделям — при include_weeks;
+    удалённые силлабусы пропускаются.
+    """
+    fields = dict(COURSE_FIELDS)
+    if include_roadmap:
+        fields['roadmap'] = '$syllabus.roadmap'
+    if include_weeks:
+        fields['stats'] = '$syllabus.stats'
+    pipeline = [
+        {'$match': {'username': username}},
+        {'$project': {'_id': 0, 'user_progress': 1}},
+        {'$unwind': {'path': '$user_progress', 'includeArrayIndex': 'position'}},
+        {'$lookup': {
+            'from': 'syllabus',
+            'localField': 'user_progress.syllabus_id',
+            'foreignField': 'id',
+            'as': 'syllabus',
+        }},
+        {'$unwind': '$syllabus'},
+        {'$sort': {'position': ASCENDING}},
+        {'$project': fields},
+    ]
+    courses = list(db['users'].aggregate(pipeline))
+    for course in courses:
+        if 'upload_date' in course:
+            course['upload_date'] = str(course['upload_date'])
+        if include_weeks:
+            course['weeks'] = week_progress(course.pop('stats', None),
+                                            course['user_progress'].get('completed_topics'))
+    return courses
+
+
+def _progress(completed: int, total: int) -> int:
+    return round(completed / total * 100) if total else 0
+
+
+def enroll(db, username: str, syllabus_id: str, completed_topics: list = None, total: int = 0) -> bool:
+    """
+    Записывает пользователя на курс одним атомарным $push (если записи ещё нет)
+    и увеличивает enrollment_count. Возвращает True, если запись добавлена.
+    """
+    completed_topics = list(dict.fromkeys(completed_topics or []))
+    entry = {'syllabus_id': syllabus_id, 'completed_topics': completed_topics,
+             'progress': _progress(len(completed_topics), total), 'tests': {}, 'topic_ts': {}}
+    update = {'$push': {'user_progress': entry}}
+    if _valid_key(syllabus_id):
+        update['$unset'] = {f'unenrolled_at.{syllabus_id}': ''}
+    result = db['users'].update_one(
+        {'username': username, 'user_progress.syllabus_id': {'$ne': syllabus_id}},
+        update,
+    )
+    if result.modified_count:
+        db['syllabus'].update_one({'id': syllabus_id}, {'$inc': {'enrollment_count': 1}})
+    return bool(result.modified_count)
+
+
+def unenroll(db, username: str, syllabus_id: str) -> bool:
+    """
+    Убирает курс из прогресса пользователя ($pull); True, если он там был.
+    Время отписки остаётся в unenrolled_at, чтобы sync_progress не записал
+    пользователя обратно более старыми офлайн-изменениями.
+    """
+    update = {'$pull': {'user_progress': {'syllabus_id': syllabus_id}}}
+    if _valid_key(syllabus_id):
+        update['$set'] = {f'unenrolled_at.{syllabus_id}': int(time.time() * 1000)}
+    result = db['users'].update_one(
+        {'username': username, 'user_progress.syllabus_id': syllabus_id},
+        update,
+    )
+    if result.modified_count:
+        db['syllabus'].update_one({'id': syllabus_id}, {'$inc': {'enrollment_count': -1}})
+    return bool(result.modified_count)
+
+
+# Число попыток заменить список тем, если его изменили параллельно
+SET_RETRIES = 3
+
+
+def set_completed_topics(db, username: str, syllabus_id: str, completed_topics: list, total: int) -> bool:
+    """
+    Заменяет список пройденных тем одного курса позиционным $set, не трогая остальные курсы.
+    Отмеченные и снятые темы получают время изменения, как в change_completed_topics.
+    Возвращает False, если пользователь не записан на курс.
+    """
+    users = db['users']
+    completed_topics = list(dict.fromkeys(completed_topics))
+    match = {'$elemMatch': {'syllabus_id': syllabus_id}}
+    for _ in range(SET_RETRIES):
+        user = users.find_one({'username': username, 'user_progress': match}, {'_id': 0, 'user_progress': match})
+        if not user:
+            return False
+        current = user['user_progress'][0].get('completed_topics', [])
+        changed = set(current) ^ set(completed_topics)
+        update = {'$set': {'user_progress.$.completed_topics': completed_topics,
+                           'user_progress.$.progress': _progress(len(completed_topics), total)}}
+        # Список заменяется, только если он не изменился после чтения, иначе время получат не те темы
+        result = users.update_one(
+            {'username': username,
+             'user_progress': {'$elemMatch': {'syllabus_id': syllabus_id, 'completed_topics': current}}},
+            _stamped(update, changed),
+        )
+        if result.matched_count:
+            return True
+    # Список постоянно меняется параллельно: последняя прочитанная разница всё равно получает время
+    result = users.update_one({'username': username, 'user_progress': match}, _stamped(update, changed))
+    return bool(result.matched_count)
+
+
+def _valid_key(value) -> bool:
+    # id темы и курса становятся ключами в topic_ts и unenrolled_at, поэтому точки и $ недопустимы
+    return isinstance(value, str) and bool(value) and '.' not in value and not value.startswith('$')
+
+
+def _stamped(update: dict, topic_ids) -> dict:
+    """
+    Добавляет в обновление время изменения тем для синхронизации (sync_progress):
+    более старые офлайн-изменения из приложения не перекроют отметку, сделанную позже.
+    """
+    now = int(time.time() * 1000)
+    stamps = {f'user_progress.$.topic_ts.{topic_id}': now for topic_id in topic_ids if _valid_key(topic_id)}
+    if stamps:
+        update.setdefault('$set', {}).update(stamps)
+    return update
+
+
+def change_completed_topics(db, username: str, syllabus_id: str, add: list, remove: list, total: int):
+    """
+    Отмечает темы пройденными ($addToSet) и снимает отметку ($pullAll), затем пересчитывает
+    progress. Одновременные изменения с разных устройств не теряются. Возвращает
+    актуальную запись прогресса или None, если пользователь не записан на курс.
+    """
+    users = db['users']
+    match = {'$elemMatch': {'syllabus_id': syllabus_id}}
+    query = {'username': username, 'user_progress': match}
+    if add:
+        users.update_one(query, _stamped({'$addToSet': {'user_progress.$.completed_topics': {'$each': list(add)}}}, add))
+    if remove:
+        users.update_one(query, _stamped({'$pullAll': {'user_progress.$.completed_topics': list(remove)}}, remove))
+    user = users.find_one(query, {'_id': 0, 'user_progress': match})
+    if not user:
+        return None
+    entry = user['user_progress'][0]
+    completed = entry.setdefault('completed_topics', [])
+    entry['progress'] = _progress(len(completed), total)
+    # progress записывается, только если список тем не изменился после чтения;
+    # иначе его пересчитает запрос, изменивший список последним
+    users.update_one(
+        {'username': username,
+         'user_progress': {'$elemMatch': {'syllabus_id': syllabus_id, 'completed_topics': {'$size': len(completed)}}}},
+        {'$set': {'user_progress.$.progress': entry['progress']}},
+    )
+    return entry
+
+
+def parse_sync_changes(items, max_changes: int) -> dict:
+    """
+    Проверяет пакет изменений прогресса из приложения:
+    [{'syllabus_id', 'topic_id', 'completed': bool, 'ts': мс с эпохи}].
+    Для каждой пары (курс, тема) остаётся последнее по ts изменение; время из будущего
+    ограничивается текущим временем сервера. Возвращает {(syllabus_id, topic_id): (completed, ts)}.
+    Бросает ValueError на неверные данные.
+    """
+    if not isinstance(items, list):
+        raise ValueError('changes должен быть списком')
+    if len(items) > max_changes:
+        raise ValueError(f'Не больше {max_changes} изменений за один запрос')
+    now = int(time.time() * 1000)
+    latest = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('Каждое изменение должно быть объектом')
+        syllabus_id, topic_id, ts = item.get('syllabus_id'), item.get('topic_id'), item.get('ts')
+        if not _valid_key(syllabus_id):
+            raise ValueError(f'Неверный syllabus_id: {syllabus_id!r}')
+        if not _valid_key(topic_id):
+            raise ValueError(f'Неверный topic_id: {topic_id!r}')
+        if not isinstance(ts, (int, float)) or isinstance(ts, bool) or ts < 0:
+            raise ValueError('ts должен быть временем в миллисекундах')
+        change = (bool(item.get('completed', True)), min(int(ts), now))
+        key = (syllabus_id, topic_id)
+        if key not in latest or change[1] >= latest[key][1]:
+            latest[key] = change
+    return latest
+
+
+def _topic_operation(username: str, syllabus_id: str, topic_id: str, completed: bool, ts: int) -> UpdateOne:
+    # Изменение применяется, только если тема не менялась позже (last-writer-wins по теме)
+    stamp = f'topic_ts.{topic_id}'
+    # $not $gte: отметки времени нет или она старше ts
+    query = {'username': username, 'user_progress': {'$elemMatch': {
+        'syllabus_id': syllabus_id, stamp: {'$not': {'$gte': ts}},
+    }}}
+    update = {'$set': {f'user_progress.$.{stamp}': ts}}
+    if completed:
+        update['$addToSet'] = {'user_progress.$.completed_topics': topic_id}
+    else:
+        update['$pull'] = {'user_progress.$.completed_topics': topic_id}
+    return UpdateOne(query, update)
+
+
+def sync_progress(db, username: str, changes: dict) -> dict:
+    """
+    Применяет пакет изменений из parse_sync_changes одним bulk_write и пересчитывает
+    progress затронутых курсов. На курс, на который пользователь не записан, он записывается,
+    только если среди изменений есть отметка темы новее его отписки от этого курса;
+    иначе изменения курса отбрасываются.
+    Возвращает {'applied': число применённых изменений, 'courses': состояние всех курсов}.
+    """
+    users = db['users']
+    user = users.find_one({'username': username}, {'_id': 0, 'user_progress.syllabus_id': 1, 'unenrolled_at': 1})
+    if user is None:
+        return {'applied': 0, 'courses': []}
+    enrolled = {item['syllabus_id'] for item in user.get('user_progress', [])}
+    unenrolled_at = user.get('unenrolled_at', {})
+    for syllabus_id in {syllabus_id for syllabus_id, _ in changes} - enrolled:
+        # Изменения, сделанные до отписки, к курсу больше не относятся
+        cutoff = unenrolled_at.get(syllabus_id, -1)
+        course_changes = [key for key, (_, ts) in changes.items() if key[0] == syllabus_id and ts > cutoff]
+        if any(changes[key][0] for key in course_changes) and get_stats(db, syllabus_id) is not None:
+            enroll(db, username, syllabus_id)
+            changes = {key: value for key, value in changes.items()
+                       if key[0] != syllabus_id or key in course_changes}
+        else:
+            changes = {key: value for key, value in changes.items() if key[0] != syllabus_id}
+    touched = {syllabus_id for syllabus_id, _ in changes}
+
+    operations = [_topic_operation(username, syllabus_id, topic_id, completed, ts)
+                  for (syllabus_id, topic_id), (completed, ts) in changes.items()]
+    applied = users.bulk_write(operations, ordered=False).modified_count if operations else 0
+
+    user = users.find_one({'username': username}, {'_id': 0, 'user_progress': 1}) or {}
+    courses = []
+    progress_updates = []
+    for entry in user.get('user_progress', []):
+        syllabus_id = entry['syllabus_id']
+        completed = entry.get('completed_topics', [])
+        course = {'syllabus_id': syllabus_id, 'completed_topics': completed, 'progress': entry.get('progress', 0)}
+        if syllabus_id in touched:
+            stats = get_stats(db, syllabus_id)
+            course['progress'] = _progress(len(completed), stats['total_subtopics'] if stats else 0)
+            course['weeks'] = week_progress(stats, completed)
+            # Как в change_completed_topics: progress пишется, если список тем не изменился после чтения
+            progress_updates.append(UpdateOne(
+                {'username': username, 'user_progress': {'$elemMatch': {
+                    'syllabus_id': syllabus_id, 'completed_topics': {'$size': len(completed)}}}},
+                {'$set': {'user_progress.$.progress': course['progress']}},
+            ))
+        courses.append(course)
+    if progress_updates:
+        users.bulk_write(progress_updates, ordered=False)
+    return {'applied': applied, 'courses': courses}
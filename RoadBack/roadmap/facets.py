@@ -0,0 +1,204 @@
+import datetime
+
+from pymongo import ASCENDING, DESCENDING
+
+from .indexes import ensure_indexes_once
+from .roadmap_stats import LEGACY_PROJECTION, compute_stats, invalidate_stats
+from .search import prefix_patterns
+
+# Каталог силлабусов с фильтрами и счётчиками по фасетам. Страница выдачи читается
+# отдельным find, чтобы сортировка и пропуск шли по индексу; счётчики считаются
+# одним aggregate с $facet по уже отфильтрованному набору.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Границы корзин для счётчиков по числу недель и записавшихся пользователей
+WEEK_COUNT_BOUNDARIES = [0, 10, 15, 16, 20, 53]
+ENROLLMENT_BOUNDARIES = [0, 1, 10, 50, 100, 1000]
+
+SORTS = {
+    'date': [('upload_date', DESCENDING), ('_id', DESCENDING)],
+    'enrollment': [('enrollment_count', DESCENDING), ('upload_date', DESCENDING)],
+    'weeks': [('week_count', ASCENDING), ('upload_date', DESCENDING)],
+}
+
+RESULT_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'title': '$roadmap.subject.label',
+    'description': '$roadmap.subject.description',
+    'upload_date': 1,
+    'processed': 1,
+    'week_count': 1,
+    'enrollment_count': 1,
+}
+
+
+def _int_param(params, name: str):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} должен быть числом')
+
+
+def _date_param(params, name: str):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} должен быть датой в формате ГГГГ-ММ-ДД')
+
+
+def _range(minimum, maximum) -> dict:
+    condition = {}
+    if minimum is not None:
+        condition['$gte'] = minimum
+    if maximum is not None:
+        condition['$lte'] = maximum
+    return condition
+
+
+def parse_filters(params) -> dict:
+    """
+    Условие $match из GET-параметров: q, uploaded_from, uploaded_to (ГГГГ-ММ-ДД),
+    processed (true/false), weeks_min, weeks_max, topic, enrolled_min, enrolled_max.
+    topic ищется по началу темы недели или подтемы.
+    Бросает ValueError на неверные значения.
+    """
+    match = {}
+    query = params.get('q', '').strip()
+    if query:
+        match['$text'] = {'$search': query}
+
+    uploaded_from = _date_param(params, 'uploaded_from')
+    uploaded_to = _date_param(params, 'uploaded_to')
+    if uploaded_to is not None:
+        # Граница включительно: до конца указанного дня
+        uploaded_to += datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+    if uploaded_from is not None or uploaded_to is not None:
+        match['upload_date'] = _range(uploaded_from, uploaded_to)
+
+    processed = params.get('processed')
+    if processed:
+        if processed.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError('processed должен быть true или false')
+        match['processed'] = processed.lower() in ('true', '1')
+
+    weeks = _range(_int_param(params, 'weeks_min'), _int_param(params, 'weeks_max'))
+    if weeks:
+        match['week_count'] = weeks
+
+    enrolled = _range(_int_param(params, 'enrolled_min'), _int_param(params, 'enrolled_max'))
+    if enrolled:
+        match['enrollment_count'] = enrolled
+
+    topic = params.get('topic', '').strip()
+    if topic:
+        patterns = {'$in': prefix_patterns(topic)}
+        match['$or'] = [{'roadmap.weeks.main_topic': patterns}, {'roadmap.subtopics.label': patterns}]
+    return match
+
+
+def _bucket(field: str, boundaries: list) -> list:
+    return [{'$bucket': {
+        'groupBy': {'$ifNull': [f'${field}', 0]},
+        'boundaries': boundaries,
+        'default': f'{boundaries[-1]}+',
+        'output': {'count': {'$sum': 1}},
+    }}]
+
+
+def _bucket_label(bucket_id, boundaries: list) -> str:
+    if isinstance(bucket_id, str):
+        return bucket_id
+    idx = boundaries.index(bucket_id)
+    upper = boundaries[idx + 1] - 1
+    return str(bucket_id) if upper == bucket_id else f'{bucket_id}-{upper}'
+
+
+def faceted_catalog(db, params) -> dict:
+    """
+    Страница каталога (find по индексу сортировки) и счётчики по фасетам (aggregate с $facet).
+    Возвращает {'results', 'total', 'page', 'has_more', 'facets'}.
+    """
+    match = parse_filters(params)
+    page = max(1, _int_param(params, 'page') or 1)
+    limit = max(1, min(_int_param(params, 'limit') or DEFAULT_LIMIT, MAX_LIMIT))
+
+    if '$text' in match:
+        sort = [('score', {'$meta': 'textScore'}), ('upload_date', DESCENDING)]
+    else:
+        sort_name = params.get('sort', 'date')
+        if sort_name not in SORTS:
+            raise ValueError(f"sort должен быть одним из: {', '.join(SORTS)}")
+        sort = SORTS[sort_name]
+
+    collection = db['syllabus']
+    ensure_indexes_once(db, 'syllabus')
+    # Внутри $facet индексы не используются, поэтому страница читается отдельно
+    results = list(collection.find(match, RESULT_PROJECTION).sort(sort).skip((page - 1) * limit).limit(limit))
+    pipeline = [
+        {'$match': match},
+        {'$facet': {
+            'total': [{'$count': 'count'}],
+            'processed': [{'$group': {'_id': '$processed', 'count': {'$sum': 1}}}],
+            'week_count': _bucket('week_count', WEEK_COUNT_BOUNDARIES),
+            'enrollment_count': _bucket('enrollment_count', ENROLLMENT_BOUNDARIES),
+            'upload_month': [
+                {'$group': {'_id': {'$dateToString': {'format': '%Y-%m', 'date': '$upload_date'}},
+                            'count': {'$sum': 1}}},
+                {'$sort': {'_id': DESCENDING}},
+            ],
+        }},
+    ]
+    facet = next(collection.aggregate(pipeline), {})
+
+    for item in results:
+        if 'upload_date' in item:
+            item['upload_date'] = str(item['upload_date'])
+    total = facet['total'][0]['count'] if facet.get('total') else 0
+    return {
+        'results': results,
+        'total': total,
+        'page': page,
+        'has_more': page * limit < total,
+        'facets': {
+            'processed': {str(bool(item['_id'])).lower(): item['count'] for item in facet.get('processed', [])},
+            'week_count': {_bucket_label(item['_id'], WEEK_COUNT_BOUNDARIES): item['count']
+                           for item in facet.get('week_count', [])},
+            'enrollment_count': {_bucket_label(item['_id'], ENROLLMENT_BOUNDARIES): item['count']
+                                 for item in facet.get('enrollment_count', [])},
+            'upload_month': {item['_id']: item['count'] for item in facet.get('upload_month', []) if item['_id']},
+        },
+    }
+
+
+def refresh_counts(db) -> int:
+    """
+    Пересчитывает week_count, enrollment_count и stats у всех силлабусов
+    (для данных, сохранённых до появления счётчиков, и для исправления расхождений).
+    """
+    enrollments = {
+        item['_id']: item['count']
+        for item in db['users'].aggregate([
+            {'$unwind': '$user_progress'},
+            {'$group': {'_id': '$user_progress.syllabus_id', 'count': {'$sum': 1}}},
+        ])
+    }
+    updated = 0
+    for syllabus in db['syllabus'].find({}, {**LEGACY_PROJECTION, '_id': 1, 'id': 1}):
+        stats = compute_stats(syllabus.get('roadmap', {}))
+        db['syllabus'].update_one({'_id': syllabus['_id']}, {'$set': {
+            'week_count': stats['week_count'],
+            'enrollment_count': enrollments.get(syllabus.get('id'), 0),
+            'stats': stats,
+        }})
+        invalidate_stats(syllabus.get('id'))
+        updated += 1
+    return updated
@@ -0,0 +1,47 @@
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    sha256 содержимого файла, читаемого блоками. Используется, чтобы
+    не обрабатывать повторно уже загруженные неизменённые силлабусы.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_upload(uploaded_file, directory: str):
+    """
+    Сохраняет загруженный файл с адресацией по содержимому и возвращает (путь, sha256).
+    Хэш считается по тем же блокам, что пишутся на диск, без повторного чтения файла.
+    Файл кладётся в <directory>/<первые 2 символа хэша>/<хэш><расширение>;
+    если такой файл уже есть, новая копия не создаётся.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+                destination.write(chunk)
+        source_hash = digest.hexdigest()
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        file_path = os.path.join(directory, source_hash[:2], source_hash + extension)
+        if os.path.exists(file_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return file_path, source_hash
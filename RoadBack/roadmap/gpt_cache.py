@@ -0,0 +1,152 @@
+import datetime
+import hashlib
+import threading
+import unicodedata
+
+from django.conf import settings
+from pymongo.errors import DuplicateKeyError
+
+from .db import db
+from .indexes import ensure_indexes_once
+from .parser import structure_data_with_gpt, PROMPT_VERSION
+
+# Кэш результатов структурирования силлабусов через GPT.
+# Ключ — хэш нормализованного текста и версии промпта.
+CACHE_COLLECTION = db['gpt_structure_cache']
+STATS_COLLECTION = db['gpt_structure_cache_stats']
+
+_setup_done = False
+_setup_lock = threading.Lock()
+
+
+def normalize_for_cache(text: str) -> str:
+    """
+    Нормализует извлечённый текст, чтобы незначимые различия
+    (пробелы, переносы, форма Unicode) не давали промахов кэша.
+    """
+    text = unicodedata.normalize('NFC', text)
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def cache_key(text: str, prompt_version: str = PROMPT_VERSION) -> str:
+    """
+    Ключ кэша: sha256 от версии промпта и нормализованного текста.
+    """
+    digest = hashlib.sha256()
+    digest.update(prompt_version.encode('utf-8'))
+    digest.update(b'\n')
+    digest.update(normalize_for_cache(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _ensure_setup():
+    """
+    Один раз на процесс создаёт индексы и удаляет записи,
+    сделанные с устаревшей версией промпта.
+    """
+    global _setup_done
+    if _setup_done:
+        return
+    with _setup_lock:
+        if _setup_done:
+            return
+        # Уникальный ключ и TTL-индекс по expires_at объявлены в indexes.py
+        ensure_indexes_once(db, CACHE_COLLECTION.name)
+        invalidate_stale_entries()
+        _setup_done = True
+
+
+def invalidate_stale_entries() -> int:
+    """
+    Удаляет записи, созданные с другой версией промпта. Возвращает число удалённых.
+    """
+    result = CACHE_COLLECTION.delete_many({'prompt_version': {'$ne': PROMPT_VERSION}})
+    return result.deleted_count
+
+
+def _count(field: str):
+    STATS_COLLECTION.update_one(
+        {'_id': PROMPT_VERSION},
+        {'$inc': {field: 1}, '$set': {'updated_at': datetime.datetime.now()}},
+        upsert=True
+    )
+
+
+def get_cached_structure(text: str):
+    """
+    Возвращает закэшированную структуру или None. При попадании продлевает срок жизни записи.
+    """
+    _ensure_setup()
+    now = datetime.datetime.now()
+    entry = CACHE_COLLECTION.find_one_and_update(
+        {'key': cache_key(text), 'expires_at': {'$gt': now}},
+        {
+            '$inc': {'hits': 1},
+            '$set': {
+                'last_hit_at': now,
+                'expires_at': now + datetime.timedelta(days=settings.GPT_CACHE_TTL_DAYS)
+            }
+        },
+        projection={'data': 1}
+    )
+    if entry:
+        _count('hits')
+        return entry['data']
+    _count('misses')
+    return None
+
+
+def store_structure(text: str, structured_data: dict):
+    """
+    Сохраняет результат структурирования в кэш.
+    """
+    _ensure_setup()
+    now = datetime.datetime.now()
+    try:
+        CACHE_COLLECTION.update_one(
+            {'key': cache_key(text)},
+            {
+                '$set': {
+                    'prompt_version': PROMPT_VERSION,
+                    'data': structured_data,
+                    'created_at': now,
+                    'expires_at': now + datetime.timedelta(days=settings.GPT_CACHE_TTL_DAYS),
+                },
+                '$setOnInsert': {'hits': 0},
+            },
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Параллельная обработка того же текста уже сохранила запись
+        pass
+
+
+def structure_with_cache(text: str, structure_fn=structure_data_with_gpt) -> dict:
+    """
+    Структурирует текст силлабуса, обращаясь к GPT только при промахе кэша.
+    Результат, собранный из частично разобранного ответа (incomplete), не кэшируется,
+    чтобы повторная загрузка того же файла снова обратилась к GPT.
+    """
+    if not settings.GPT_CACHE_ENABLED:
+        return structure_fn(text)
+    cached = get_cached_structure(text)
+    if cached is not None:
+        return cached
+    structured_data = structure_fn(text)
+    if not structured_data.get('incomplete'):
+        store_structure(text, structured_data)
+    return structured_data
+
+
+def cache_stats() -> dict:
+    """
+    Счётчики попаданий/промахов для текущей версии промпта и размер кэша.
+    """
+    stats = STATS_COLLECTION.find_one({'_id': PROMPT_VERSION}) or {}
+    return {
+        'prompt_version': PROMPT_VERSION,
+        'hits': stats.get('hits', 0),
+        'misses': stats.get('misses', 0),
+        'entries': CACHE_COLLECTION.estimated_document_count(),
+    }
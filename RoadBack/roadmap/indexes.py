@@ -0,0 +1,199 @@
+import threading
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+# Все индексы MongoDB, на которые рассчитаны запросы приложения, в одном месте.
+# Создаются командой ensure_indexes и при запуске сервера; модули, которые
+# пишут в коллекцию, вызывают ensure_collection_indexes один раз на процесс.
+
+TEXT_INDEX_NAME = 'syllabus_text_search'
+
+INDEXES = {
+    'users': [
+        {'keys': [('username', ASCENDING)], 'unique': True},
+        # email необязателен: уникальность проверяется только у заполненных строк
+        {'keys': [('email', ASCENDING)], 'unique': True, 'name': 'email_unique',
+         'partialFilterExpression': {'email': {'$type': 'string'}}},
+        {'keys': [('user_progress.syllabus_id', ASCENDING)]},
+    ],
+    'syllabus': [
+        {'keys': [('id', ASCENDING)], 'unique': True},
+        # Новый предмет вставляется upsert'ом по названию: уникальность не даёт
+        # двум параллельным сохранениям создать два силлабуса с разными id
+        {'keys': [('roadmap.subject.label', ASCENDING)], 'unique': True},
+        # Фильтр каталога по началу темы недели или подтемы
+        {'keys': [('roadmap.weeks.main_topic', ASCENDING)]},
+        {'keys': [('roadmap.subtopics.label', ASCENDING)]},
+        {'keys': [('source_hash', ASCENDING)], 'sparse': True},
+        # Фильтры каталога с сортировкой по дате загрузки
+        {'keys': [('processed', ASCENDING), ('upload_date', DESCENDING)]},
+        {'keys': [('week_count', ASCENDING), ('upload_date', DESCENDING)]},
+        {'keys': [('enrollment_count', DESCENDING), ('upload_date', DESCENDING)]},
+        # _id — второй ключ сортировки каталога по дате
+        {'keys': [('upload_date', DESCENDING), ('_id', DESCENDING)]},
+        {'keys': [('roadmap.subject.label', TEXT), ('roadmap.subject.description', TEXT),
+                  ('roadmap.weeks.main_topic', TEXT), ('roadmap.subtopics.label', TEXT)],
+         'name': TEXT_INDEX_NAME,
+         'weights': {'roadmap.subject.label': 10, 'roadmap.weeks.main_topic': 5,
+                     'roadmap.subtopics.label': 3, 'roadmap.subject.description': 1},
+         'default_language': 'russian',
+         # В документах силлабусов нет поля языка; не даём MongoDB искать его в 'language'
+         'language_override': 'search_language'},
+    ],
+    'syllabus_catalog': [
+        {'keys': [('id', ASCENDING)], 'unique': True},
+    ],
+    'ingestion_jobs': [
+        {'keys': [('id', ASCENDING)], 'unique': True},
+        {'keys': [('options.source_hash', ASCENDING), ('status', ASCENDING)]},
+        {'keys': [('status', ASCENDING), ('created_at', ASCENDING)]},
+    ],
+    'gpt_structure_cache': [
+        {'keys': [('key', ASCENDING)], 'unique': True},
+        # TTL-индекс: MongoDB сам удаляет записи после expires_at
+        {'keys': [('expires_at', ASCENDING)], 'expireAfterSeconds': 0},
+    ],
+}
+
+# Запросы, которые выполняют view и фоновые задачи: (коллекция, фильтр, сортировка).
+# По ним отчёт проверяет, что план выполнения использует индекс.
+QUERY_SHAPES = [
+    ('users', {'username': 'u'}, None),
+    ('users', {'email': 'e@example.com'}, None),
+    ('users', {'user_progress.syllabus_id': 's'}, None),
+    ('syllabus', {'id': 's'}, None),
+    ('syllabus', {'id': {'$in': ['s']}}, None),
+    ('syllabus', {'roadmap.subject.label': 'l'}, None),
+    ('syllabus', {'roadmap.subject.label': {'$regex': '^Фил'}}, [('roadmap.subject.label', ASCENDING)]),
+    ('syllabus', {'$or': [{'roadmap.weeks.main_topic': {'$regex': '^Лог'}},
+                          {'roadmap.subtopics.label': {'$regex': '^Лог'}}]}, None),
+    ('syllabus', {'source_hash': 'h'}, None),
+    ('syllabus', {'processed': True}, [('upload_date', DESCENDING)]),
+    ('syllabus', {'week_count': {'$gte': 10}}, [('upload_date', DESCENDING)]),
+    ('syllabus', {'enrollment_count': {'$gte': 1}}, [('enrollment_count', DESCENDING), ('upload_date', DESCENDING)]),
+    ('syllabus', {}, [('upload_date', DESCENDING), ('_id', DESCENDING)]),
+    ('syllabus', {'$text': {'$search': 'философия'}}, None),
+    ('syllabus_catalog', {'id': 's'}, None),
+    ('ingestion_jobs', {'id': 'j'}, None),
+    ('ingestion_jobs', {'options.source_hash': 'h', 'status': {'$in': ['queued', 'running']}}, None),
+    ('gpt_structure_cache', {'key': 'k'}, None),
+]
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def _index_name(spec: dict) -> str:
+    return spec.get('name') or '_'.join(f'{field}_{direction}' for field, direction in spec['keys'])
+
+
+def _create(collection, spec: dict) -> str:
+    options = {key: value for key, value in spec.items() if key != 'keys'}
+    return collection.create_index(spec['keys'], **options)
+
+
+def ensure_collection_indexes(db, collection_name: str, replace_conflicting: bool = False) -> list:
+    """
+    Создаёт объявленные индексы коллекции. Возвращает список (имя индекса, статус, ошибка):
+    'ok' — индекс есть или создан, 'replaced' — пересоздан с новыми параметрами,
+    'conflict' — существует индекс с тем же ключом и другими параметрами,
+    'failed' — создать не удалось (например, дубликаты при уникальном индексе).
+    """
+    collection = db[collection_name]
+    results = []
+    for spec in INDEXES.get(collection_name, []):
+        name = _index_name(spec)
+        try:
+            _create(collection, spec)
+            results.append((name, 'ok', None))
+        except OperationFailure as e:
+            # 85/86 — IndexOptionsConflict / IndexKeySpecsConflict: индекс с тем же ключом
+            # или именем создан раньше с другими параметрами (например, без unique)
+            if e.code in (85, 86):
+                if not replace_conflicting:
+                    results.append((name, 'conflict', str(e)))
+                    continue
+                try:
+                    _drop_same_key(collection, spec)
+                    _create(collection, spec)
+                    results.append((name, 'replaced', None))
+                except OperationFailure as retry_error:
+                    results.append((name, 'failed', str(retry_error)))
+            else:
+                results.append((name, 'failed', str(e)))
+    return results
+
+
+def _drop_same_key(collection, spec: dict):
+    name = _index_name(spec)
+    for index in collection.list_indexes():
+        if index['name'] == '_id_':
+            continue
+        same_key = list(index['key'].items()) == list(spec['keys'])
+        is_text = any(direction == TEXT for _, direction in spec['keys']) and 'textIndexVersion' in index
+        if index['name'] == name or same_key or is_text:
+            collection.drop_index(index['name'])
+
+
+def print_index_problems(collection_name: str, results: list):
+    """Печатает индексы, которые не удалось создать (conflict / failed)."""
+    for name, status, error in results:
+        if status not in ('ok', 'replaced'):
+            print(f"Индекс {collection_name}.{name}: {status} — {error}")
+
+
+def ensure_all_indexes(db, replace_conflicting: bool = False) -> dict:
+    return {name: ensure_collection_indexes(db, name, replace_conflicting) for name in INDEXES}
+
+
+def ensure_indexes_once(db, collection_name: str):
+    """
+    Ленивая версия для кода, который пишет в коллекцию: один раз на процесс.
+    Ошибки не прерывают запись, но печатаются; подробности показывает команда ensure_indexes.
+    """
+    if collection_name in _ready:
+        return
+    with _ready_lock:
+        if collection_name not in _ready:
+            print_index_problems(collection_name, ensure_collection_indexes(db, collection_name))
+            _ready.add(collection_name)
+
+
+def index_usage(db, collection_name: str) -> list:
+    """
+    Статистика обращений к индексам ($indexStats) с момента запуска mongod:
+    список (имя, число операций).
+    """
+    stats = db[collection_name].aggregate([{'$indexStats': {}}])
+    return sorted((item['name'], item['accesses']['ops']) for item in stats)
+
+
+def _plan_stages(plan: dict):
+    yield plan.get('stage')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+def explain_query_shapes(db) -> list:
+    """
+    План выполнения каждого запроса из QUERY_SHAPES: (коллекция, фильтр, сортировка,
+    использует ли индекс, стадии плана). COLLSCAN означает, что индекса не хватает.
+    """
+    report = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+        except OperationFailure as e:
+            report.append((collection_name, query, sort, False, [f'error: {e}']))
+            continue
+        stages = [stage for stage in _plan_stages(plan) if stage]
+        uses_index = 'COLLSCAN' not in stages
+        report.append((collection_name, query, sort, uses_index, stages))
+    return report
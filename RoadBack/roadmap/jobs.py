@@ -0,0 +1,210 @@
+import datetime
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from pymongo import ReturnDocument
+
+from .db import db
+from .indexes import ensure_indexes_once
+from .pipeline import run_ingestion
+
+# Фоновые задачи обработки силлабусов. Состояние хранится в MongoDB,
+# поэтому задачи переживают перезапуск сервера.
+JOBS_COLLECTION = db['ingestion_jobs']
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_FAILED = 'failed'
+JOB_DONE = 'done'
+
+# Владелец выполняемой задачи: процесс отмечает свои задачи heartbeat_at,
+# чтобы другие процессы не считали их прерванными
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+_executor = None
+_executor_lock = threading.Lock()
+# Включается resume_pending_jobs в процессе сервера: тогда поток heartbeat
+# ещё и периодически возвращает в очередь задачи остановленных процессов
+_recovery_enabled = False
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Возвращает пул фоновых обработчиков; вместе с ним запускается поток heartbeat.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.INGESTION_WORKERS,
+                thread_name_prefix='syllabus-ingest'
+            )
+            threading.Thread(target=_heartbeat_loop, name='syllabus-ingest-heartbeat', daemon=True).start()
+    return _executor
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(settings.INGESTION_HEARTBEAT_SECONDS)
+        try:
+            JOBS_COLLECTION.update_many(
+                {'worker_id': WORKER_ID, 'status': JOB_RUNNING},
+                {'$set': {'heartbeat_at': datetime.datetime.now()}}
+            )
+            if _recovery_enabled:
+                for job_id in requeue_stale_jobs():
+                    _executor.submit(run_job, job_id)
+        except Exception as e:
+            print(f"Не удалось обновить heartbeat задач: {str(e)}")
+
+
+def requeue_stale_jobs() -> list:
+    """
+    Возвращает в очередь задачи 'running', владелец которых не обновлял heartbeat
+    дольше INGESTION_STALE_SECONDS (процесс остановлен). Задачи живых процессов
+    не трогаются. Возвращает id возвращённых задач.
+    """
+    now = datetime.datetime.now()
+    stale = now - datetime.timedelta(seconds=settings.INGESTION_STALE_SECONDS)
+    query = {'status': JOB_RUNNING, '$or': [
+        {'heartbeat_at': {'$lt': stale}},
+        # Задачи, начатые до появления heartbeat
+        {'heartbeat_at': {'$exists': False}, 'updated_at': {'$lt': stale}},
+    ]}
+    requeued = []
+    for job in JOBS_COLLECTION.find(query, {'_id': 0, 'id': 1}):
+        # Условие повторяется в обновлении: heartbeat мог прийти после чтения
+        result = JOBS_COLLECTION.update_one(
+            {**query, 'id': job['id']},
+            {'$set': {'status': JOB_QUEUED, 'updated_at': now}, '$unset': {'worker_id': '', 'heartbeat_at': ''}}
+        )
+        if result.modified_count:
+            requeued.append(job['id'])
+    return requeued
+
+
+def create_job(file_path: str, original_name: str, options: dict = None) -> str:
+    """
+    Создаёт запись о задаче в статусе 'queued' и возвращает её id.
+    """
+    ensure_indexes_once(db, JOBS_COLLECTION.name)
+    job_id = str(uuid.uuid4())
+    now = datetime.datetime.now()
+    JOBS_COLLECTION.insert_one({
+        'id': job_id,
+        'status': JOB_QUEUED,
+        'file_path': file_path,
+        'original_name': original_name,
+        'options': options or {},
+        'created_at': now,
+        'updated_at': now,
+        'started_at': None,
+        'finished_at': None,
+        'result': None,
+        'error': None,
+    })
+    return job_id
+
+
+def enqueue_syllabus(file_path: str, original_name: str, options: dict = None) -> str:
+    """
+    Ставит файл силлабуса в очередь на обработку и сразу возвращает id задачи.
+    options передаются в run_ingestion (например, generate_assignments).
+    """
+    job_id = create_job(file_path, original_name, options)
+    get_executor().submit(run_job, job_id)
+    return job_id
+
+
+def run_job(job_id: str):
+    """
+    Выполняет задачу. Статус переводится в 'running' атомарно, поэтому
+    одна и та же задача не будет обработана дважды; процесс записывает себя владельцем.
+    """
+    now = datetime.datetime.now()
+    job = JOBS_COLLECTION.find_one_and_update(
+        {'id': job_id, 'status': JOB_QUEUED},
+        {'$set': {'status': JOB_RUNNING, 'worker_id': WORKER_ID, 'heartbeat_at': now,
+                  'started_at': now, 'updated_at': now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        return
+
+    try:
+        result = run_ingestion(job['file_path'], on_item=_partial_writer(job_id),
+                               original_name=job.get('original_name'), **job.get('options', {}))
+    except Exception as e:
+        print(f"Ошибка фоновой обработки {job['file_path']}: {str(e)}")
+        JOBS_COLLECTION.update_one({'id': job_id}, {'$set': {
+            'status': JOB_FAILED,
+            'error': str(e),
+            'traceback': traceback.format_exc(),
+            'finished_at': datetime.datetime.now(),
+            'updated_at': datetime.datetime.now(),
+        }})
+        return
+
+    JOBS_COLLECTION.update_one({'id': job_id}, {
+        '$set': {
+            'status': JOB_DONE,
+            'result': result,
+            'finished_at': datetime.datetime.now(),
+            'updated_at': datetime.datetime.now(),
+        },
+        # Готовый roadmap уже сохранён в syllabus, частичный больше не нужен
+        '$unset': {'partial': ''},
+    })
+
+
+def _partial_writer(job_id: str):
+    """
+    Сохраняет элементы roadmap в задачу по мере разбора ответа GPT,
+    чтобы фронтенд мог показать частичный результат через статус задачи.
+    """
+    def on_item(kind, item):
+        if kind == 'subject':
+            update = {'$set': {'partial.subject': item}}
+        else:
+            update = {'$push': {f'partial.{kind}s': item}}
+        update.setdefault('$set', {})['updated_at'] = datetime.datetime.now()
+        JOBS_COLLECTION.update_one({'id': job_id}, update)
+    return on_item
+
+
+def resume_pending_jobs():
+    """
+    Вызывается один раз при запуске сервера (RoadmapConfig.ready): возвращает в очередь
+    задачи остановленных процессов (requeue_stale_jobs) и отправляет в пул задачи
+    в статусе 'queued'; задачу из очереди забирает только один обработчик.
+    Дальше зависшие задачи проверяет поток heartbeat этого процесса.
+    """
+    global _recovery_enabled
+    _recovery_enabled = True
+    requeue_stale_jobs()
+    executor = get_executor()
+    for job in JOBS_COLLECTION.find({'status': JOB_QUEUED}, {'id': 1}).sort('created_at', 1):
+        executor.submit(run_job, job['id'])
+
+
+def find_active_job(source_hash: str):
+    """
+    Незавершённая задача для файла с тем же содержимым, если она есть.
+    """
+    return JOBS_COLLECTION.find_one(
+        {'options.source_hash': source_hash, 'status': {'$in': [JOB_QUEUED, JOB_RUNNING]}},
+        {'_id': 0, 'id': 1, 'status': 1}
+    )
+
+
+def get_job(job_id: str):
+    """
+    Возвращает задачу без служебных полей или None.
+    """
+    return JOBS_COLLECTION.find_one({'id': job_id}, {'_id': 0, 'traceback': 0})
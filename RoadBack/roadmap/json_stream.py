@@ -0,0 +1,102 @@
+import json
+
+# Инкрементальный разбор JSON-ответа GPT со структурой roadmap. Текст подаётся
+# кусками по мере прихода из потока; как только закрывается объект предмета,
+# недели или подтемы, он декодируется и передаётся дальше, не дожидаясь конца ответа.
+
+ITEM_ARRAYS = {'weeks': 'week', 'subtopics': 'subtopic'}
+
+REQUIRED_FIELDS = {
+    'subject': ('label',),
+    'week': ('id', 'main_topic'),
+    'subtopic': ('id', 'week_id', 'label'),
+}
+
+
+def is_valid_item(kind: str, item) -> bool:
+    return isinstance(item, dict) and all(item.get(field) for field in REQUIRED_FIELDS[kind])
+
+
+class RoadmapStreamParser:
+    """
+    Сканер JSON, который отслеживает вложенность и ключи и возвращает готовые
+    элементы ('subject' | 'week' | 'subtopic', объект). Текст до первой '{'
+    (например, '```json') пропускается.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.pos = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_key = None
+        self.started = False
+
+    def feed(self, chunk: str) -> list:
+        """
+        Добавляет кусок ответа и возвращает список завершённых элементов.
+        """
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self.pos, len(text)):
+            char = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    top = self.stack[-1] if self.stack else None
+                    if top and top['type'] == '{' and top['expect_key']:
+                        try:
+                            self.last_key = json.loads(text[self.string_start:i + 1])
+                        except ValueError:
+                            self.last_key = None
+                        top['expect_key'] = False
+                continue
+
+            if not self.started:
+                if char != '{':
+                    continue
+                self.started = True
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char == ',':
+                if self.stack and self.stack[-1]['type'] == '{':
+                    self.stack[-1]['expect_key'] = True
+            elif char in '{[':
+                parent = self.stack[-1] if self.stack else None
+                key = self.last_key if parent and parent['type'] == '{' else None
+                self.stack.append({'type': char, 'key': key, 'start': i, 'expect_key': char == '{'})
+                self.last_key = None
+            elif char in '}]':
+                if not self.stack:
+                    continue
+                entry = self.stack.pop()
+                if entry['type'] == '{':
+                    item = self._complete_item(entry, text[entry['start']:i + 1])
+                    if item:
+                        items.append(item)
+        self.pos = len(text)
+        return items
+
+    def _complete_item(self, entry, raw):
+        parent = self.stack[-1] if self.stack else None
+        if parent is None:
+            return None
+        if parent['type'] == '[' and parent['key'] in ITEM_ARRAYS:
+            kind = ITEM_ARRAYS[parent['key']]
+        elif parent['type'] == '{' and entry['key'] == 'subject' and parent['key'] in ('roadmap', None):
+            kind = 'subject'
+        else:
+            return None
+        try:
+            return kind, json.loads(raw)
+        except ValueError:
+            return None
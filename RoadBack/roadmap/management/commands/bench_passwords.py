@@ -0,0 +1,32 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bcrypt password checks (logins per second) for each cost factor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13],
+                            help='bcrypt cost factors to measure')
+        parser.add_argument('--workers', type=int, default=settings.PASSWORD_HASH_WORKERS,
+                            help='Number of hashing threads (PASSWORD_HASH_WORKERS by default)')
+        parser.add_argument('--logins', type=int, default=50, help='Password checks per cost factor')
+
+    def handle(self, *args, **options):
+        password = b'benchmark-password'
+        workers = options['workers']
+        self.stdout.write(f"Потоков: {workers}, проверок на каждую стоимость: {options['logins']}")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for rounds in options['rounds']:
+                hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+                started = time.perf_counter()
+                list(executor.map(lambda _: bcrypt.checkpw(password, hashed), range(options['logins'])))
+                elapsed = time.perf_counter() - started
+                marker = ' (текущая)' if rounds == settings.BCRYPT_ROUNDS else ''
+                self.stdout.write(
+                    f"rounds={rounds}{marker}: {options['logins'] / elapsed:.1f} логинов/с, "
+                    f"{elapsed / options['logins'] * workers * 1000:.1f} мс на проверку")
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from pymongo.errors import OperationFailure
+from roadmap.db import db
+from roadmap.indexes import INDEXES, ensure_all_indexes, explain_query_shapes, index_usage
+
+
+class Command(BaseCommand):
+    help = 'Create all MongoDB indexes used by the roadmap app and report missing or unused ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--report', action='store_true',
+                            help='Show index usage ($indexStats) and query plans for the queries the views run')
+        parser.add_argument('--replace-conflicting', action='store_true',
+                            help='Drop and recreate indexes that exist with different options (e.g. without unique)')
+        parser.add_argument('--no-create', action='store_true', help='Only report, do not create indexes')
+
+    def handle(self, *args, **options):
+        if not options['no_create']:
+            for collection_name, results in ensure_all_indexes(db, options['replace_conflicting']).items():
+                for name, status, error in results:
+                    line = f'{collection_name}.{name}: {status}'
+                    if status in ('ok', 'replaced'):
+                        self.stdout.write(self.style.SUCCESS(line))
+                    else:
+                        self.stdout.write(self.style.ERROR(f'{line} — {error}'))
+
+        if options['report']:
+            self._report_usage()
+            self._report_plans()
+
+    def _report_usage(self):
+        self.stdout.write('\nИспользование индексов (с момента запуска mongod):')
+        for collection_name in INDEXES:
+            try:
+                usage = index_usage(db, collection_name)
+            except OperationFailure as e:
+                self.stdout.write(self.style.WARNING(f'{collection_name}: $indexStats недоступен — {e}'))
+                continue
+            for name, ops in usage:
+                line = f'  {collection_name}.{name}: {ops} операций'
+                if ops == 0 and name != '_id_':
+                    self.stdout.write(self.style.WARNING(line + ' (не используется)'))
+                else:
+                    self.stdout.write(line)
+
+    def _report_plans(self):
+        self.stdout.write('\nПланы запросов из roadmap.views:')
+        missing = 0
+        for collection_name, query, sort, uses_index, stages in explain_query_shapes(db):
+            line = f"  {collection_name} {query}{' sort ' + str(sort) if sort else ''}: {' > '.join(stages)}"
+            if uses_index:
+                self.stdout.write(line)
+            else:
+                missing += 1
+                self.stdout.write(self.style.ERROR(line + ' (нет индекса)'))
+        if missing:
+            self.stdout.write(self.style.ERROR(f'Запросов без индекса: {missing}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
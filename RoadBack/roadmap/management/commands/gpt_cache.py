@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from roadmap.gpt_cache import cache_stats, invalidate_stale_entries, CACHE_COLLECTION
+
+
+class Command(BaseCommand):
+    help = 'Statistics and maintenance of the GPT structuring cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge-stale', action='store_true', help='Remove entries created with an old prompt version')
+        parser.add_argument('--clear', action='store_true', help='Remove all cache entries')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = CACHE_COLLECTION.delete_many({}).deleted_count
+            self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
+        elif options['purge_stale']:
+            deleted = invalidate_stale_entries()
+            self.stdout.write(self.style.SUCCESS(f'Удалено устаревших записей: {deleted}'))
+
+        stats = cache_stats()
+        total = stats['hits'] + stats['misses']
+        hit_rate = round(stats['hits'] / total * 100, 1) if total else 0
+        self.stdout.write(f"Версия промпта: {stats['prompt_version']}")
+        self.stdout.write(f"Записей: {stats['entries']}")
+        self.stdout.write(f"Попаданий: {stats['hits']}, промахов: {stats['misses']} ({hit_rate}% попаданий)")
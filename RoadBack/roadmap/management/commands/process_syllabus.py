@@ -1,20 +1,143 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 from django.core.management.base import BaseCommand
-from roadmap.parser import parse_thematic_plan, convert_to_roadmap_structure, save_to_mongodb
+from tqdm import tqdm
+
 from roadmap.db import db
+from roadmap.fingerprint import file_sha256
+from roadmap.parser import save_many_to_mongodb
+from roadmap.pipeline import SUPPORTED_EXTENSIONS, parse_syllabus_file, complete_structuring
+
+# Хэши уже загруженных файлов; передаются в рабочие процессы один раз через initializer
+_known_hashes = set()
+
+
+def _init_worker(known_hashes):
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def _parse_worker(file_path, local_parsing):
+    """
+    Выполняется в отдельном процессе: хэширует файл и, если он ещё не загружен,
+    разбирает его локально.
+    """
+    try:
+        source_hash = file_sha256(file_path)
+        if source_hash in _known_hashes:
+            return {'path': file_path, 'hash': source_hash, 'status': 'skipped'}
+        parsed = parse_syllabus_file(file_path, local_parsing)
+        return {'path': file_path, 'hash': source_hash, 'status': 'parsed', 'parsed': parsed}
+    except Exception as e:
+        return {'path': file_path, 'status': 'error', 'error': str(e)}
+
+
+def collect_files(patterns):
+    """
+    Разворачивает аргументы командной строки (файлы, каталоги, glob-шаблоны) в список DOCX- и PDF-файлов.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [path for extension in SUPPORTED_EXTENSIONS
+                       for path in glob.glob(os.path.join(pattern, '**', '*' + extension), recursive=True)]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for path in sorted(matches):
+            # Пропускаем временные файлы Word (~$name.docx)
+            if path.lower().endswith(SUPPORTED_EXTENSIONS) and not os.path.basename(path).startswith('~$'):
+                files.append(os.path.abspath(path))
+    return list(dict.fromkeys(files))
+
 
 class Command(BaseCommand):
-    help = 'Process a syllabus file and save to MongoDB'
+    help = 'Bulk-process syllabus DOCX/PDF files (files, directories or glob patterns) and save to MongoDB'
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='Path to the syllabus DOCX file')
+        parser.add_argument('paths', nargs='+', type=str, help='DOCX/PDF files, directories or glob patterns')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Number of parsing worker processes')
+        parser.add_argument('--llm-concurrency', type=int, default=4,
+                            help='Maximum number of concurrent GPT requests')
+        parser.add_argument('--batch-size', type=int, default=20, help='Number of syllabi per MongoDB write')
+        parser.add_argument('--force', action='store_true', help='Re-process files that were already ingested')
+        parser.add_argument('--no-local', action='store_true', help='Always structure through GPT')
+        parser.add_argument('--generate-assignments', action='store_true', help='Generate assignments through GPT')
 
     def handle(self, *args, **options):
-        file_path = options['file_path']
-        self.stdout.write(f"Обработка файла: {file_path}")
+        files = collect_files(options['paths'])
+        if not files:
+            self.stdout.write(self.style.WARNING('Файлы DOCX не найдены'))
+            return
+        self.stdout.write(f"Найдено файлов: {len(files)}")
+
+        known_hashes = set() if options['force'] else set(
+            h for h in db['syllabus'].distinct('source_hash') if h
+        )
+        local_parsing = not options['no_local']
+        generate_assignments = options['generate_assignments']
+
+        batch = []
+        stats = {'saved': 0, 'skipped': 0, 'failed': 0}
+
+        def flush():
+            if batch:
+                save_many_to_mongodb(batch, db)
+                stats['saved'] += len(batch)
+                batch.clear()
+
+        progress = tqdm(total=len(files), unit='file')
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker,
+                                 initargs=(known_hashes,)) as processes, \
+                ThreadPoolExecutor(max_workers=options['llm_concurrency']) as llm:
+            pending = {processes.submit(_parse_worker, path, local_parsing): 'parse' for path in files}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'path': '?', 'status': 'error', 'error': str(e)}
+
+                    if result['status'] == 'skipped':
+                        stats['skipped'] += 1
+                        progress.update(1)
+                    elif result['status'] == 'error':
+                        stats['failed'] += 1
+                        progress.update(1)
+                        tqdm.write(f"Ошибка {result['path']}: {result['error']}")
+                    elif stage == 'parse':
+                        # Сетевой этап: GPT вызывается только при необходимости, не больше llm-concurrency сразу
+                        parsed = result.pop('parsed')
+                        if parsed['data'] is not None and not generate_assignments:
+                            result['data'] = parsed['data']
+                            result['status'] = 'structured'
+                        else:
+                            pending[llm.submit(self._structure, result, parsed, generate_assignments)] = 'llm'
+                            continue
+
+                    if result['status'] == 'structured':
+                        batch.append((result['data'], result['path'], result['hash']))
+                        known_hashes.add(result['hash'])
+                        progress.update(1)
+                        if len(batch) >= options['batch_size']:
+                            flush()
+            flush()
+        progress.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Сохранено: {stats['saved']}, пропущено (без изменений): {stats['skipped']}, ошибок: {stats['failed']}"
+        ))
+
+    @staticmethod
+    def _structure(result, parsed, generate_assignments):
         try:
-            thematic_plan = parse_thematic_plan(file_path)
-            roadmap_data = convert_to_roadmap_structure(thematic_plan)
-            save_to_mongodb(roadmap_data, db)
-            self.stdout.write(self.style.SUCCESS('Силлабус успешно обработан и сохранён!'))
+            result['data'], _ = complete_structuring(parsed, generate_assignments)
+            result['status'] = 'structured'
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка: {str(e)}'))
\ No newline at end of file
+            result['status'] = 'error'
+            result['error'] = str(e)
+        return result
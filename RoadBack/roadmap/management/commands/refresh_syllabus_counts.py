@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from roadmap.catalog import rebuild_catalog
+from roadmap.db import db
+from roadmap.facets import refresh_counts
+
+
+class Command(BaseCommand):
+    help = ('Recompute week_count, enrollment_count and topic stats used by catalog filters and progress, '
+            'and resync the subject catalog (drops entries of deleted syllabi)')
+
+    def handle(self, *args, **options):
+        updated = refresh_counts(db)
+        rebuild_catalog(db)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено силлабусов: {updated}'))
@@ -1,44 +1,40 @@
 import json
-from docx import Document
 import openai
 import uuid
 from django.conf import settings
 import datetime
+import hashlib
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from .docx_stream import load_content
+from .json_stream import RoadmapStreamParser, is_valid_item
+from .structure import TOTAL_WEEKS, merge_week_parts
+from .catalog import remove_catalog_entries, update_catalog_entries
+from .indexes import ensure_indexes_once
+from .autocomplete import index_syllabi
+from .roadmap_cache import compute_roadmap_hash
+from .roadmap_stats import compute_stats, invalidate_stats
+from .roadmap_diff import stabilize_subtopic_ids, diff_roadmap
 
 # Настройка API-ключа OpenAI (замените на свой ключ)
 openai.api_key = settings.OPENAI_API_KEY
-def extract_text_from_docx(file_path: str) -> str:
+def extract_text_from_docx(content_or_path) -> str:
     """
     Извлекает весь текст из DOCX-файла, включая абзацы и таблицы.
+    Принимает путь или уже прочитанный DocxContent.
     """
     try:
-        doc = Document(file_path)
-        full_text = []
-
-        # Извлекаем текст из абзацев
-        for para in doc.paragraphs:
-            if para.text.strip():
-                full_text.append(para.text.strip())
-
-        # Извлекаем текст из таблиц
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    cell_text = '\n'.join([p.text.strip() for p in cell.paragraphs if p.text.strip()])
-                    if cell_text:
-                        full_text.append(cell_text)
-
-        return '\n'.join(full_text)
+        return load_content(content_or_path).full_text()
 
     except Exception as e:
         print(f"Ошибка при извлечении текста: {str(e)}")
         raise
 
-def structure_data_with_gpt(text: str) -> dict:
-    """
-    Отправляет текст в GPT и просит создать структуру с предметом, 15 неделями и подтемами, генерируя задания.
-    """
-    prompt = f"""
+STRUCTURE_MODEL = "gpt-4o"
+STRUCTURE_MAX_TOKENS = 4000
+STRUCTURE_SYSTEM_PROMPT = "Ты помощник, который преобразует текст силлабуса в структурированную базу данных в формате JSON с объектом 'roadmap'. Возвращай ТОЛЬКО валидный JSON без пояснений."
+
+STRUCTURE_PROMPT_TEMPLATE = """
     Ты помощник, который преобразует текст силлабуса в структурированную базу данных в формате JSON с объектом "roadmap". Текст силлабуса описывает курс, который длится 15 недель, с тематическим планом, включающим главные темы и подтемы. Твоя задача:
 
     1. Создай объект "roadmap" с тремя вложенными полями:
@@ -68,27 +64,131 @@ def structure_data_with_gpt(text: str) -> dict:
     {text}
     """
 
-    # Отправка запроса в GPT
+# Промпты для посекционного режима: описание курса и диапазон недель структурируются отдельно
+SECTION_MAX_TOKENS = 2500
+
+SUBJECT_PROMPT_TEMPLATE = """
+    По фрагменту силлабуса определи предмет и верни JSON вида {{"subject": {{"label": "...", "description": "..."}}}}.
+    - "label": название предмета (например, "Философия").
+    - "description": краткое описание курса из раздела "Краткое описание курса".
+    Возвращай ТОЛЬКО валидный JSON без пояснений.
+
+    Фрагмент силлабуса:
+
+    {text}
+    """
+
+WEEKS_SECTION_PROMPT_TEMPLATE = """
+    Ниже фрагмент тематического плана силлабуса для недель с {first_week} по {last_week}.
+    Верни JSON вида {{"weeks": [...], "subtopics": [...]}} только для этих недель:
+       - "weeks": объекты с полями "id" ("week-N"), "week_number" (N), "main_topic", "description".
+       - "subtopics": объекты с полями "id" ("subtopic-1", "subtopic-2" и т.д. в пределах фрагмента), "week_id",
+         "label", "description", "material" (из списка литературы ниже) и "assignment" — задание, которое ты
+         придумаешь сам на основе темы недели и названия подтемы (эссе, презентация, анализ и т.д.).
+    Диапазоны недель (например, "1-3") раздели на отдельные недели с общей темой.
+    Если в фрагменте нет данных для какой-то недели из диапазона, заполни её минимальными значениями.
+    Возвращай ТОЛЬКО валидный JSON без пояснений.
+
+    Фрагмент тематического плана:
+
+    {text}
+
+    Список литературы:
+
+    {literature}
+    """
+
+ASSIGNMENTS_PROMPT_TEMPLATE = """
+    Для каждой подтемы курса "{subject}" придумай задание на основе темы недели ("main_topic") и названия подтемы ("label").
+    Задания должны быть конкретными, выполнимыми и соответствовать академическому контексту
+    (например, написать эссе, подготовить презентацию, провести анализ и т.д.).
+    Верни JSON вида {{"assignments": {{"<id подтемы>": "<задание>", ...}}}} для всех подтем из списка.
+    Возвращай ТОЛЬКО валидный JSON без пояснений.
+
+    Подтемы:
+
+    {subtopics}
+    """
+
+# Версия промпта: меняется при любом изменении шаблонов, модели или параметров,
+# что автоматически инвалидирует кэш структурирования
+PROMPT_VERSION = hashlib.sha256(
+    '\n'.join([
+        STRUCTURE_MODEL, str(STRUCTURE_MAX_TOKENS), str(SECTION_MAX_TOKENS), STRUCTURE_SYSTEM_PROMPT,
+        STRUCTURE_PROMPT_TEMPLATE, SUBJECT_PROMPT_TEMPLATE, WEEKS_SECTION_PROMPT_TEMPLATE, ASSIGNMENTS_PROMPT_TEMPLATE
+    ]).encode('utf-8')
+).hexdigest()[:16]
+
+
+def extract_json_object(result: str) -> dict:
+    """
+    Вырезает из ответа GPT внешний JSON-объект {...} и декодирует его.
+    """
+    json_start = result.find('{')
+    json_end = result.rfind('}') + 1
+    if json_start != -1 and json_end != -1:
+        result = result[json_start:json_end]
+    return json.loads(result)
+
+
+def complete_json_with_gpt(prompt: str, max_tokens: int) -> dict:
+    """
+    Один запрос к GPT с системным промптом структурирования; возвращает разобранный JSON.
+    """
     response = openai.ChatCompletion.create(
-        model="gpt-4o",
+        model=STRUCTURE_MODEL,
         messages=[
-            {"role": "system", "content": "Ты помощник, который преобразует текст силлабуса в структурированную базу данных в формате JSON с объектом 'roadmap'. Возвращай ТОЛЬКО валидный JSON без пояснений."},
+            {"role": "system", "content": STRUCTURE_SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ],
-        max_tokens=4000,
+        max_tokens=max_tokens,
         temperature=0.1
     )
+    return extract_json_object(response.choices[0].message['content'].strip())
+
+
+def structure_data_with_gpt(text: str, on_item=None) -> dict:
+    """
+    Отправляет текст в GPT и просит создать структуру с предметом, 15 неделями и подтемами, генерируя задания.
+
+    Ответ читается потоком и разбирается инкрементально: каждый предмет, неделя и подтема
+    проверяются и передаются в on_item(kind, item) сразу после получения. Если хвост
+    ответа повреждён или обрезан, roadmap собирается из уже принятых элементов.
+    """
+    prompt = STRUCTURE_PROMPT_TEMPLATE.format(text=text)
+
+    # Отправка запроса в GPT
+    response = openai.ChatCompletion.create(
+        model=STRUCTURE_MODEL,
+        messages=[
+            {"role": "system", "content": STRUCTURE_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=STRUCTURE_MAX_TOKENS,
+        temperature=0.1,
+        stream=True
+    )
+
+    stream_parser = RoadmapStreamParser()
+    received = {'subject': [], 'week': [], 'subtopic': []}
+    for chunk in response:
+        delta = chunk.choices[0].delta.get('content')
+        if not delta:
+            continue
+        for kind, item in stream_parser.feed(delta):
+            if not is_valid_item(kind, item):
+                print(f"Пропущен некорректный элемент '{kind}' в ответе GPT: {item}")
+                continue
+            received[kind].append(item)
+            if on_item:
+                on_item(kind, item)
 
     # Извлечение результата
-    result = response.choices[0].message['content'].strip()
+    result = stream_parser.text.strip()
 
     # Попытка извлечь JSON
     try:
-        json_start = result.find('{')
-        json_end = result.rfind('}') + 1
-        if json_start != -1 and json_end != -1:
-            result = result[json_start:json_end]
-        structured_data = json.loads(result)
+        structured_data = extract_json_object(result)
 
         # Проверка на обязательные поля
         if 'roadmap' not in structured_data or 'subject' not in structured_data['roadmap'] or 'weeks' not in structured_data['roadmap'] or 'subtopics' not in structured_data['roadmap']:
@@ -96,37 +196,192 @@ def structure_data_with_gpt(text: str) -> dict:
         if len(structured_data['roadmap']['weeks']) != 15:
             raise ValueError(f"Ожидается ровно 15 недель, получено {len(structured_data['roadmap']['weeks'])}")
         return structured_data
-    except json.JSONDecodeError as e:
-        print(f"Ошибка декодирования JSON из ответа GPT: {e}")
-        print(f"Полученный текст: {result}")
-        raise
+    except ValueError as e:
+        if not received['subject'] or not received['week']:
+            print(f"Ошибка декодирования JSON из ответа GPT: {e}")
+            print(f"Полученный текст: {result}")
+            raise
+        # Повреждение затронуло только хвост: используем уже принятые элементы
+        print(f"Ответ GPT разобран частично ({e}); недель: {len(received['week'])}, подтем: {len(received['subtopic'])}")
+        structured_data = merge_week_parts(received['subject'][0], [(received['week'], received['subtopic'], 1, TOTAL_WEEKS)])
+        # Недостающие недели дополнены заглушками: такой результат не кэшируется (см. gpt_cache)
+        structured_data['incomplete'] = True
+        return structured_data
+
+def generate_assignments_with_gpt(structured_data: dict) -> dict:
+    """
+    Генерирует задания для подтем уже построенного roadmap одним запросом к GPT.
+    Используется поверх локального разбора, когда генерация заданий запрошена явно.
+    """
+    roadmap = structured_data['roadmap']
+    topics = {week['id']: week['main_topic'] for week in roadmap['weeks']}
+    subtopics = [
+        {'id': subtopic['id'], 'main_topic': topics.get(subtopic['week_id'], ''), 'label': subtopic['label']}
+        for subtopic in roadmap['subtopics']
+    ]
+    if not subtopics:
+        return structured_data
+
+    prompt = ASSIGNMENTS_PROMPT_TEMPLATE.format(
+        subject=roadmap['subject']['label'],
+        subtopics=json.dumps(subtopics, ensure_ascii=False)
+    )
+    assignments = complete_json_with_gpt(prompt, STRUCTURE_MAX_TOKENS).get('assignments', {})
+    for subtopic in roadmap['subtopics']:
+        if assignments.get(subtopic['id']):
+            subtopic['assignment'] = assignments[subtopic['id']]
+    return structured_data
+
+# Число попыток записи при конкурентном изменении того же силлабуса
+SAVE_RETRIES = 3
+
 
-def save_to_mongodb(structured_data: dict, db, file_path: str):
+def _prepare_roadmap_write(structured_data: dict, existing, file_path: str, source_hash: str = None):
+    """
+    Готовит запись одного силлабуса: (syllabus_id, фильтр, обновление, upsert, новая версия).
+
+    Новый предмет вставляется upsert'ом по названию. Для существующего id подтем
+    сохраняются, в $set попадают только изменившиеся недели и подтемы, а
+    roadmap_version увеличивается, только если roadmap действительно изменился.
+    Фильтр по текущей версии защищает от перезаписи параллельного изменения.
+    """
+    roadmap = structured_data['roadmap']
+    metadata = {
+        'file_path': file_path,
+        'upload_date': datetime.datetime.now(),
+        'processed': True,
+        'week_count': len(roadmap['weeks']),
+    }
+    if source_hash:
+        metadata['source_hash'] = source_hash
+
+    if not existing:
+        syllabus_id = str(uuid.uuid4())
+        document = {'id': syllabus_id, 'roadmap': roadmap, 'roadmap_version': 1,
+                    'roadmap_hash': compute_roadmap_hash(roadmap), 'stats': compute_stats(roadmap),
+                    'enrollment_count': 0, **metadata}
+        return syllabus_id, {'roadmap.subject.label': roadmap['subject']['label']}, {'$setOnInsert': document}, True, 1
+
+    syllabus_id = existing['id']
+    old_roadmap = existing.get('roadmap', {})
+    roadmap = dict(roadmap, subtopics=stabilize_subtopic_ids(old_roadmap.get('subtopics', []), roadmap['subtopics']))
+    structured_data['roadmap'] = roadmap
+
+    version = existing.get('roadmap_version')
+    query = {'id': syllabus_id, 'roadmap_version': version if version is not None else {'$exists': False}}
+    changes = diff_roadmap(old_roadmap, roadmap)
+    new_version = (version or 0) + 1 if changes or version is None else version
+    update = {'$set': {**metadata, **changes, 'roadmap_version': new_version,
+                       'roadmap_hash': compute_roadmap_hash(roadmap), 'stats': compute_stats(roadmap)}}
+    return syllabus_id, query, update, False, new_version
+
+
+ROADMAP_PROJECTION = {'id': 1, 'roadmap': 1, 'roadmap_version': 1}
+
+
+def _after_save(db, saved: list):
+    """
+    Обновляет производные данные после записи: каталог предметов, индекс автодополнения
+    и кэш статистики roadmap. saved — список (syllabus_id, roadmap).
+    """
+    version = update_catalog_entries(db, [syllabus_id for syllabus_id, _ in saved])
+    invalidate_stats(*(syllabus_id for syllabus_id, _ in saved))
+    index_syllabi(saved, version)
+
+
+def delete_syllabus(db, syllabus_id: str) -> bool:
+    """
+    Удаляет силлабус и его запись в каталоге, подсказках и кэше статистики.
+    Возвращает False, если силлабуса не было.
+    """
+    result = db['syllabus'].delete_one({'id': syllabus_id})
+    version = remove_catalog_entries(db, [syllabus_id])
+    invalidate_stats(syllabus_id)
+    index_syllabi([(syllabus_id, None)], version)
+    return bool(result.deleted_count)
+
+
+def save_to_mongodb(structured_data: dict, db, file_path: str, source_hash: str = None):
     """
     Сохраняет структурированные данные в MongoDB, обновляя существующий предмет или создавая новый.
+    source_hash — sha256 исходного файла, по нему повторная загрузка того же файла пропускается.
+
+    Повторная загрузка не переписывает roadmap целиком: обновляются только изменившиеся
+    недели и подтемы, id подтем остаются прежними, а roadmap_version растёт при изменениях.
     """
     syllabus_collection = db['syllabus']
+    ensure_indexes_once(db, 'syllabus')
 
     # Извлекаем название предмета из структуры
     subject_label = structured_data['roadmap']['subject']['label']
 
-    # Проверяем, существует ли уже запись для этого предмета
-    existing_syllabus = syllabus_collection.find_one({'roadmap.subject.label': subject_label})
-    syllabus_id = str(uuid.uuid4()) if not existing_syllabus else existing_syllabus['id']
+    for _ in range(SAVE_RETRIES):
+        existing_syllabus = syllabus_collection.find_one({'roadmap.subject.label': subject_label}, ROADMAP_PROJECTION)
+        syllabus_id, query, update, upsert, version = _prepare_roadmap_write(
+            structured_data, existing_syllabus, file_path, source_hash)
+        try:
+            result = syllabus_collection.update_one(query, update, upsert=upsert)
+        except DuplicateKeyError:
+            # Тот же предмет только что вставил другой процесс — следующая попытка его обновит
+            continue
+        if result.upserted_id is not None:
+            print(f"Сохранены данные для нового предмета: {subject_label}")
+            _after_save(db, [(syllabus_id, structured_data['roadmap'])])
+            return syllabus_id
+        if not upsert and result.matched_count:
+            print(f"Обновлены данные для предмета: {subject_label} (версия {version})")
+            _after_save(db, [(syllabus_id, structured_data['roadmap'])])
+            return syllabus_id
+        # Силлабус изменили или создали параллельно — сравниваем заново
 
-    # Подготавливаем данные для сохранения
-    syllabus_data = {
-        'id': syllabus_id,
-        'file_path': file_path,
-        'upload_date': datetime.datetime.now(),
-        'processed': True,
-        'roadmap': structured_data['roadmap']
+    raise RuntimeError(f"Не удалось сохранить силлабус '{subject_label}': конкурентные изменения")
+
+def save_many_to_mongodb(items: list, db) -> list:
+    """
+    Пакетная версия save_to_mongodb для массовой загрузки: один запрос на поиск
+    существующих предметов и один bulk_write на весь пакет.
+    items — список кортежей (structured_data, file_path, source_hash). Возвращает id силлабусов.
+    """
+    syllabus_collection = db['syllabus']
+    ensure_indexes_once(db, 'syllabus')
+    labels = [data['roadmap']['subject']['label'] for data, _, _ in items]
+    existing_by_label = {
+        doc['roadmap']['subject']['label']: doc
+        for doc in syllabus_collection.find({'roadmap.subject.label': {'$in': labels}}, ROADMAP_PROJECTION)
     }
 
-    # Обновляем или вставляем запись
-    if existing_syllabus:
-        syllabus_collection.update_one({'id': syllabus_id}, {'$set': syllabus_data})
-        print(f"Обновлены данные для предмета: {subject_label}")
-    else:
-        syllabus_collection.insert_one(syllabus_data)
-        print(f"Сохранены данные для нового предмета: {subject_label}")
+    operations = []
+    syllabus_ids = []
+    inserts = []
+    for (structured_data, file_path, source_hash), label in zip(items, labels):
+        syllabus_id, query, update, upsert, version = _prepare_roadmap_write(
+            structured_data, existing_by_label.get(label), file_path, source_hash)
+        syllabus_ids.append(syllabus_id)
+        inserts.append(upsert)
+        operations.append(UpdateOne(query, update, upsert=upsert))
+        # Повтор того же предмета в пакете сравнивается с только что подготовленной версией
+        existing_by_label[label] = {'id': syllabus_id, 'roadmap': structured_data['roadmap'], 'roadmap_version': version}
+
+    if not operations:
+        return syllabus_ids
+    try:
+        result = syllabus_collection.bulk_write(operations, ordered=True)
+    except BulkWriteError:
+        # Пакет прерван (тот же предмет вставил другой процесс): сохраняем по одному, это идемпотентно
+        return [save_to_mongodb(data, db, file_path, source_hash) for data, file_path, source_hash in items]
+
+    # Вставка нового предмета засчитывается только по upserted_ids: upsert, совпавший
+    # с документом, созданным параллельно, ничего не записывает и сгенерированный id не сохраняет
+    retry = {idx for idx, insert in enumerate(inserts) if insert and idx not in result.upserted_ids}
+    updates = [idx for idx, insert in enumerate(inserts) if not insert]
+    if result.matched_count - len(retry) < len(updates):
+        # Часть существующих силлабусов изменилась параллельно; какие именно, bulk_write не сообщает
+        retry.update(updates)
+    saved = []
+    for idx, (data, file_path, source_hash) in enumerate(items):
+        if idx in retry:
+            syllabus_ids[idx] = save_to_mongodb(data, db, file_path, source_hash)
+        else:
+            saved.append((syllabus_ids[idx], data['roadmap']))
+    _after_save(db, saved)
+    return syllabus_ids
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+from .lru import LRUCache
+
+# Хэширование паролей вне потока запроса: bcrypt выполняется в ограниченном пуле
+# потоков (bcrypt отпускает GIL), очередь к пулу ограничена, а попытки входа
+# ограничиваются по IP и по имени пользователя, чтобы наплыв логинов не занял весь CPU.
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хэширование переполнена — запрос нужно повторить позже."""
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__('Too many attempts')
+        self.retry_after = retry_after
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.PASSWORD_HASH_QUEUE)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS,
+                                               thread_name_prefix='bcrypt')
+    return _executor
+
+
+def _submit(fn, *args):
+    """
+    Ставит задачу в пул; если в очереди уже PASSWORD_HASH_QUEUE задач, сразу отказывает.
+    """
+    if not _pending.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+async def hash_password(password: str, rounds: int = None) -> str:
+    return await asyncio.wrap_future(_submit(_hash, password, rounds or settings.BCRYPT_ROUNDS))
+
+
+async def check_password(password: str, hashed: str) -> bool:
+    return await asyncio.wrap_future(_submit(_check, password, hashed))
+
+
+class RateLimiter:
+    """
+    Счётчик попыток в фиксированном окне для каждого ключа (IP или имени пользователя).
+    Число отслеживаемых ключей ограничено, старые вытесняются.
+    """
+
+    def __init__(self, limit: int, window: int, maxsize: int = 100000):
+        self.limit = limit
+        self.window = window
+        self._windows = LRUCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str) -> int:
+        """
+        Учитывает попытку. Возвращает 0, если она разрешена, иначе секунды до нового окна.
+        """
+        if not self.limit or not key:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key) or (now, 0)
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.limit:
+                return max(1, int(self.window - (now - started)))
+            self._windows.set(key, (started, count + 1))
+        return 0
+
+
+_ip_limiter = RateLimiter(settings.AUTH_RATE_LIMIT_PER_IP, settings.AUTH_RATE_LIMIT_WINDOW)
+_username_limiter = RateLimiter(settings.AUTH_RATE_LIMIT_PER_USERNAME, settings.AUTH_RATE_LIMIT_WINDOW)
+
+
+def client_ip(request) -> str:
+    if settings.AUTH_TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def admit(request, username: str = None):
+    """
+    Проверка перед хэшированием пароля: бросает RateLimited, если превышен лимит
+    попыток с этого IP или для этого имени пользователя.
+    """
+    retry_after = _ip_limiter.hit(client_ip(request))
+    if not retry_after and username:
+        retry_after = _username_limiter.hit(username.lower())
+    if retry_after:
+        raise RateLimited(retry_after)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from multiprocessing import TimeoutError
+
+from django.conf import settings
+
+from .docx_stream import DocxContent, Paragraph
+
+# Чтение PDF-силлабусов: текст страниц извлекается параллельно в отдельных процессах
+# и отдаётся по порядку страниц, не дожидаясь разбора всего документа.
+# Страница, которая не успела за отведённое время, пропускается.
+#
+# Процессы разбора не порождаются fork'ом процесса Django: в нём работают потоки
+# и открыт MongoClient, и копия такого процесса может зависнуть на унаследованных
+# блокировках. Используется forkserver (или spawn, где его нет), а число одновременно
+# разбираемых PDF ограничено PDF_MAX_CONCURRENT на процесс.
+
+DEFAULT_PAGE_TIMEOUT = 30
+# Сколько страниц держать в работе на один процесс
+PAGES_IN_FLIGHT_PER_WORKER = 2
+
+_context = None
+_context_lock = threading.Lock()
+# Создаётся при первом разборе: модуль предзагружается в forkserver раньше, чем применяются настройки
+_pdf_slots = None
+
+# Читатель открывается один раз в каждом рабочем процессе
+_reader = None
+
+
+def _get_context():
+    global _context
+    with _context_lock:
+        if _context is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context('forkserver')
+                # Сервер заранее импортирует PyPDF2, процессы разбора стартуют быстро
+                _context.set_forkserver_preload(['roadmap.pdf_reader', 'PyPDF2'])
+            else:
+                _context = multiprocessing.get_context('spawn')
+    return _context
+
+
+def _get_slots() -> threading.BoundedSemaphore:
+    global _pdf_slots
+    with _context_lock:
+        if _pdf_slots is None:
+            _pdf_slots = threading.BoundedSemaphore(settings.PDF_MAX_CONCURRENT)
+    return _pdf_slots
+
+
+def _init_worker(file_path: str):
+    global _reader
+    from PyPDF2 import PdfReader
+    _reader = PdfReader(file_path)
+
+
+def _page_count() -> int:
+    return len(_reader.pages)
+
+
+def _extract_page(index: int):
+    return index, _reader.pages[index].extract_text() or ''
+
+
+def _start_pool(file_path: str, workers: int):
+    return _get_context().Pool(workers, initializer=_init_worker, initargs=(file_path,))
+
+
+def iter_pdf_pages(file_path: str, workers: int = None, page_timeout: float = None):
+    """
+    Генератор (номер страницы, текст) в порядке страниц. Для пропущенной по таймауту
+    страницы текст равен None. Если страница зависла, пул перезапускается, а
+    остальные страницы из очереди отправляются заново. Сам документ разбирается
+    только в рабочих процессах.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    page_timeout = page_timeout or DEFAULT_PAGE_TIMEOUT
+
+    with _get_slots():
+        pool = _start_pool(file_path, workers)
+        try:
+            # Повреждённый PDF может зависнуть уже при открытии и держать слот бесконечно
+            try:
+                total = pool.apply_async(_page_count).get(timeout=page_timeout)
+            except TimeoutError:
+                raise ValueError(f"Не удалось открыть PDF {file_path}: превышено время {page_timeout} с")
+            in_flight = workers * PAGES_IN_FLIGHT_PER_WORKER
+            pending = deque()
+            next_page = 0
+            while next_page < total or pending:
+                while next_page < total and len(pending) < in_flight:
+                    pending.append((next_page, pool.apply_async(_extract_page, (next_page,))))
+                    next_page += 1
+
+                index, result = pending.popleft()
+                try:
+                    _, text = result.get(timeout=page_timeout)
+                except TimeoutError:
+                    print(f"Страница {index + 1} файла {file_path} пропущена: превышено время {page_timeout} с")
+                    pool.terminate()
+                    pool = _start_pool(file_path, workers)
+                    pending = deque((idx, pool.apply_async(_extract_page, (idx,))) for idx, _ in pending)
+                    text = None
+                yield index, text
+        finally:
+            pool.terminate()
+
+
+def iter_pdf_paragraphs(file_path: str, workers: int = None, page_timeout: float = None):
+    """
+    Непустые строки страниц как абзацы, по мере извлечения страниц.
+    """
+    for _, text in iter_pdf_pages(file_path, workers, page_timeout):
+        for line in (text or '').splitlines():
+            line = line.strip()
+            if line:
+                yield Paragraph(line)
+
+
+def read_pdf(file_path: str, workers: int = None, page_timeout: float = None) -> DocxContent:
+    """
+    Читает PDF в ту же структуру, что и read_docx: каждая непустая строка страницы
+    становится абзацем. Таблиц в результате нет, поэтому такой документ
+    структурируется через GPT.
+    """
+    return DocxContent(list(iter_pdf_paragraphs(file_path, workers, page_timeout)), file_path)
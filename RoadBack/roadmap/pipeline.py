@@ -0,0 +1,97 @@
+import os
+
+from django.conf import settings
+
+from .parser import save_to_mongodb, generate_assignments_with_gpt
+from .docx_parser import parse_syllabus_locally
+from .gpt_cache import structure_with_cache
+from .sectioned import structure_syllabus
+from .fingerprint import file_sha256
+from .docx_stream import read_docx
+from .pdf_reader import read_pdf
+from .text_prep import prepare_prompt_text, count_tokens
+from .db import db
+
+
+SUPPORTED_EXTENSIONS = ('.docx', '.pdf')
+
+
+def read_document(file_path: str):
+    """
+    Читает DOCX или PDF в общую структуру блоков, с которой работают все извлекатели.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.pdf':
+        return read_pdf(file_path, settings.PDF_WORKERS, settings.PDF_PAGE_TIMEOUT)
+    if extension == '.docx':
+        return read_docx(file_path)
+    raise ValueError(f"Неподдерживаемый формат файла: {extension or file_path}")
+
+
+def parse_syllabus_file(file_path: str, local_parsing: bool = None, original_name: str = None) -> dict:
+    """
+    Локальная часть обработки без сети: строит roadmap из таблицы тематического плана,
+    а если таблицы нет — возвращает подготовленный текст для структурирования через GPT.
+    original_name — имя загруженного файла: сохранённый файл назван по хэшу содержимого,
+    а название предмета без «кавычек» в шапке берётся из имени файла.
+    Результат: {'data': roadmap или None, 'text': текст или None,
+    'tokens': {'before', 'after'} — токены промпта до и после подготовки текста}.
+    """
+    if local_parsing is None:
+        local_parsing = settings.SYLLABUS_LOCAL_PARSING
+    # Документ читается один раз и передаётся всем извлекателям
+    content = read_document(file_path)
+    # В PDF нет таблиц, поэтому он сразу идёт на структурирование через GPT
+    if local_parsing and content.tables:
+        try:
+            return {'data': parse_syllabus_locally(content, original_name), 'text': None, 'tokens': None}
+        except ValueError as e:
+            print(f"Локальный разбор недоступен для {file_path}: {str(e)}")
+
+    # В GPT уходят только нужные промпту разделы, без дублей объединённых ячеек
+    text = prepare_prompt_text(content)
+    # Токены попадают в результат обработки (prompt_tokens), отдельно не печатаются
+    tokens = {
+        'before': count_tokens(content.full_text()),
+        'after': count_tokens(text),
+    }
+    return {'data': None, 'text': text, 'tokens': tokens}
+
+
+def complete_structuring(parsed: dict, generate_assignments: bool = None, on_item=None):
+    """
+    Сетевая часть обработки: GPT-структурирование текста (с кэшем по содержимому)
+    или генерация заданий поверх локального разбора. Возвращает (structured_data, source).
+    on_item(kind, item) получает элементы roadmap по мере их разбора из ответа GPT.
+    """
+    if generate_assignments is None:
+        generate_assignments = settings.SYLLABUS_GENERATE_ASSIGNMENTS
+    if parsed['data'] is None:
+        structure_fn = lambda text: structure_syllabus(text, on_item=on_item)  # noqa: E731
+        return structure_with_cache(parsed['text'], structure_fn=structure_fn), 'gpt'
+    if generate_assignments:
+        return generate_assignments_with_gpt(parsed['data']), 'local+gpt'
+    return parsed['data'], 'local'
+
+
+def run_ingestion(file_path: str, generate_assignments: bool = None, source_hash: str = None,
+                  on_item=None, original_name: str = None) -> dict:
+    """
+    Полный цикл обработки силлабуса: разбор, структурирование и сохранение в MongoDB.
+    Используется и синхронной загрузкой, и фоновыми задачами.
+
+    Сначала roadmap строится локально из таблицы тематического плана. GPT вызывается,
+    только если таблицы нет или если запрошена генерация заданий.
+    on_item(kind, item) вызывается для каждого предмета, недели и подтемы, как только
+    они получены от GPT, — так можно показать частичный roadmap до завершения обработки.
+    original_name — исходное имя загруженного файла (см. parse_syllabus_file).
+    """
+    parsed = parse_syllabus_file(file_path, original_name=original_name)
+    structured_data, source = complete_structuring(parsed, generate_assignments, on_item)
+    syllabus_id = save_to_mongodb(structured_data, db, file_path, source_hash or file_sha256(file_path))
+    return {
+        'syllabus_id': syllabus_id,
+        'subject': structured_data['roadmap']['subject']['label'],
+        'source': source,
+        'prompt_tokens': parsed['tokens'],
+    }
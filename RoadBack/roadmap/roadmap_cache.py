@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import json
+
+from .lru import LRUCache
+
+try:
+    import brotli
+except ImportError:  # без brotli ответы сжимаются только gzip
+    brotli = None
+
+# Кэш ответов get_roadmap: хэш содержимого roadmap хранится в документе и служит ETag,
+# а сериализованный и заранее сжатый ответ держится в памяти по (subject_id, хэш, представление).
+
+ROADMAP_RESPONSE_PROJECTION = {
+    '_id': 0,
+    'roadmap_hash': 1,
+    'roadmap.subject': 1,
+    'roadmap.weeks': 1,
+    'roadmap.subtopics': 1,
+}
+
+_payload_cache = None
+
+
+def compute_roadmap_hash(roadmap: dict) -> str:
+    """
+    sha256 канонического JSON roadmap: не зависит от порядка ключей в словарях.
+    """
+    canonical = json.dumps(roadmap, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def make_etag(roadmap_hash: str, view: str = 'full') -> str:
+    # Слабый ETag: одно и то же содержимое отдаётся в разных кодировках сжатия.
+    # Разные представления одного roadmap (полное, оглавление, неделя) различаются суффиксом
+    tag = roadmap_hash[:32] if view == 'full' else f'{roadmap_hash[:32]}-{view}'
+    return 'W/"%s"' % tag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return 'identity'
+
+
+def _outline_pipeline(subject_id: str) -> list:
+    """
+    Предмет и заголовки недель с числом подтем; подтемы считаются в MongoDB и не передаются.
+    """
+    return [
+        {'$match': {'id': subject_id}},
+        {'$project': {
+            '_id': 0,
+            'roadmap_hash': 1,
+            'subject': '$roadmap.subject',
+            'weeks': {'$map': {
+                'input': '$roadmap.weeks',
+                'as': 'week',
+                'in': {
+                    'id': '$$week.id',
+                    'week_number': '$$week.week_number',
+                    'main_topic': '$$week.main_topic',
+                    'description': '$$week.description',
+                    'next_week_id': '$$week.next_week_id',
+                    'subtopic_count': {'$size': {'$filter': {
+                        'input': '$roadmap.subtopics',
+                        'as': 'subtopic',
+                        'cond': {'$eq': ['$$subtopic.week_id', '$$week.id']},
+                    }}},
+                },
+            }},
+        }},
+    ]
+
+
+def _week_pipeline(subject_id: str, week_id: str) -> list:
+    """
+    Одна неделя и только её подтемы (в порядке roadmap).
+    """
+    return [
+        {'$match': {'id': subject_id}},
+        {'$project': {
+            '_id': 0,
+            'roadmap_hash': 1,
+            'week': {'$arrayElemAt': [{'$filter': {
+                'input': '$roadmap.weeks',
+                'as': 'week',
+                'cond': {'$eq': ['$$week.id', week_id]},
+            }}, 0]},
+            'subtopics': {'$filter': {
+                'input': '$roadmap.subtopics',
+                'as': 'subtopic',
+                'cond': {'$eq': ['$$subtopic.week_id', week_id]},
+            }},
+        }},
+    ]
+
+
+def _load_view(db, subject_id: str, view: str, week_id: str = None):
+    """
+    Читает из базы данные нужного представления: (тело ответа, roadmap_hash) или None.
+    """
+    if view == 'outline':
+        result = next(db['syllabus'].aggregate(_outline_pipeline(subject_id)), None)
+        if not result:
+            return None
+        # Порядок недель стабилен: по номеру недели, как в цепочке next_week_id
+        weeks = sorted(result.get('weeks') or [], key=lambda week: week.get('week_number') or 0)
+        body = {'roadmap': {'subject': result['subject'], 'weeks': weeks}}
+    elif view == 'week':
+        result = next(db['syllabus'].aggregate(_week_pipeline(subject_id, week_id)), None)
+        if not result or not result.get('week'):
+            return None
+        body = {
+            'subject_id': subject_id,
+            'week': result['week'],
+            'subtopics': result.get('subtopics') or [],
+            'next_week_id': result['week'].get('next_week_id'),
+        }
+    else:
+        result = db['syllabus'].find_one({'id': subject_id}, ROADMAP_RESPONSE_PROJECTION)
+        if not result:
+            return None
+        roadmap = result['roadmap']
+        body = {
+            'roadmap': {
+                'subject': roadmap['subject'],
+                'weeks': roadmap['weeks'],
+                'subtopics': roadmap['subtopics'],
+            }
+        }
+    return body, result.get('roadmap_hash')
+
+
+def _build_payloads(body: dict) -> dict:
+    data = json.dumps(body).encode('utf-8')
+    payloads = {'identity': data, 'gzip': gzip.compress(data, compresslevel=6)}
+    if brotli is not None:
+        payloads['br'] = brotli.compress(data)
+    return payloads
+
+
+def get_roadmap_payloads(db, subject_id: str, roadmap_hash: str, view: str = 'full', week_id: str = None,
+                         maxsize: int = 256):
+    """
+    (сериализованный ответ во всех кодировках, roadmap_hash этого ответа) для представления
+    view ('full', 'outline', 'week') или None, если предмета или недели нет. Документ читается
+    из базы только при промахе кэша; тогда хэш берётся из прочитанного документа и может
+    быть новее переданного.
+    """
+    global _payload_cache
+    if _payload_cache is None:
+        _payload_cache = LRUCache(maxsize=maxsize)
+    key = (subject_id, roadmap_hash, view, week_id)
+    payloads = _payload_cache.get(key)
+    if payloads is not None:
+        return payloads, roadmap_hash
+    loaded = _load_view(db, subject_id, view, week_id)
+    if loaded is None:
+        return None
+    body, current_hash = loaded
+    payloads = _build_payloads(body)
+    # Roadmap могли обновить между проверкой ETag и чтением — такой ответ не кэшируем
+    if current_hash == roadmap_hash:
+        _payload_cache.set(key, payloads)
+    return payloads, current_hash or roadmap_hash
+
+
+def ensure_roadmap_hash(db, subject_id: str):
+    """
+    Для силлабусов, сохранённых до появления roadmap_hash: считает хэш и записывает его.
+    """
+    syllabus = db['syllabus'].find_one({'id': subject_id}, {'_id': 0, 'roadmap': 1})
+    if not syllabus:
+        return None
+    roadmap_hash = compute_roadmap_hash(syllabus['roadmap'])
+    db['syllabus'].update_one({'id': subject_id, 'roadmap_hash': {'$exists': False}},
+                              {'$set': {'roadmap_hash': roadmap_hash}})
+    return roadmap_hash
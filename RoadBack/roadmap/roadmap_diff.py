@@ -0,0 +1,84 @@
+import re
+
+# Сравнение нового roadmap с уже сохранённым: стабильные id подтем между
+# повторными загрузками и точечные $set только для изменившихся частей.
+
+SUBTOPIC_ID_RE = re.compile(r'^subtopic-(\d+)$')
+
+
+def _label_key(label) -> str:
+    return ' '.join(str(label or '').lower().replace('ё', 'е').split())
+
+
+def stabilize_subtopic_ids(old_subtopics: list, new_subtopics: list) -> list:
+    """
+    Переназначает id новых подтем так, чтобы совпадающие подтемы сохранили прежние id
+    (от них зависят completed_topics пользователей). Совпадение ищется по неделе
+    и названию, затем только по названию (подтема переехала в другую неделю).
+    Новые подтемы получают номера после максимального существующего.
+    """
+    by_week_label = {}
+    by_label = {}
+    max_number = 0
+    for subtopic in old_subtopics:
+        by_week_label.setdefault((subtopic.get('week_id'), _label_key(subtopic.get('label'))), []).append(subtopic['id'])
+        by_label.setdefault(_label_key(subtopic.get('label')), []).append(subtopic['id'])
+        match = SUBTOPIC_ID_RE.match(str(subtopic.get('id', '')))
+        if match:
+            max_number = max(max_number, int(match.group(1)))
+
+    used = set()
+
+    def take(candidates):
+        for candidate in candidates or []:
+            if candidate not in used:
+                used.add(candidate)
+                return candidate
+        return None
+
+    result = []
+    unmatched = []
+    for subtopic in new_subtopics:
+        subtopic = dict(subtopic)
+        label = _label_key(subtopic.get('label'))
+        subtopic_id = take(by_week_label.get((subtopic.get('week_id'), label)))
+        if subtopic_id is None:
+            subtopic_id = take(by_label.get(label))
+        if subtopic_id is None:
+            unmatched.append(subtopic)
+        else:
+            subtopic['id'] = subtopic_id
+        result.append(subtopic)
+
+    for subtopic in unmatched:
+        max_number += 1
+        subtopic['id'] = f'subtopic-{max_number}'
+    return result
+
+
+def _array_updates(path: str, old_items: list, new_items: list) -> dict:
+    """
+    $set для массива: поэлементно, если порядок id не изменился, иначе массив целиком.
+    """
+    if [item.get('id') for item in old_items] != [item.get('id') for item in new_items]:
+        return {path: new_items}
+    return {
+        f'{path}.{idx}': new_item
+        for idx, (old_item, new_item) in enumerate(zip(old_items, new_items))
+        if old_item != new_item
+    }
+
+
+def diff_roadmap(old_roadmap: dict, new_roadmap: dict) -> dict:
+    """
+    Возвращает словарь для $set с изменившимися частями roadmap (пустой, если изменений нет).
+    """
+    updates = {}
+    if old_roadmap.get('subject') != new_roadmap['subject']:
+        updates['roadmap.subject'] = new_roadmap['subject']
+    updates.update(_array_updates('roadmap.weeks', old_roadmap.get('weeks', []), new_roadmap['weeks']))
+    updates.update(_array_updates('roadmap.subtopics', old_roadmap.get('subtopics', []), new_roadmap['subtopics']))
+    for key, value in new_roadmap.items():
+        if key not in ('subject', 'weeks', 'subtopics') and old_roadmap.get(key) != value:
+            updates[f'roadmap.{key}'] = value
+    return updates
@@ -0,0 +1,80 @@
+from django.conf import settings
+
+from .lru import LRUCache
+
+# Статистика roadmap для расчёта прогресса: число недель, подтем всего и id подтем
+# каждой недели. Считается при сохранении силлабуса и хранится в поле stats,
+# поэтому пересчёт прогресса не читает тело roadmap. Кэш процесса хранит stats
+# по (id, roadmap_version): версия сверяется с базой, поэтому изменение roadmap
+# в другом процессе не оставляет здесь устаревшую статистику.
+
+VERSION_PROJECTION = {'_id': 0, 'roadmap_version': 1}
+STATS_PROJECTION = {'_id': 0, 'stats': 1, 'roadmap_version': 1}
+# Для силлабусов, сохранённых до появления stats: только то, из чего их можно посчитать
+LEGACY_PROJECTION = {'_id': 0, 'roadmap.weeks.id': 1, 'roadmap.subtopics.id': 1, 'roadmap.subtopics.week_id': 1}
+
+_cache = LRUCache(maxsize=settings.ROADMAP_STATS_CACHE_SIZE, ttl=settings.ROADMAP_STATS_CACHE_TTL)
+
+
+def compute_stats(roadmap: dict) -> dict:
+    """
+    {'week_count', 'total_subtopics', 'weeks': [{'id', 'subtopic_ids'}]} в порядке недель.
+    Подтемы со ссылкой на несуществующую неделю в weeks не попадают.
+    """
+    weeks = {week.get('id'): [] for week in roadmap.get('weeks', [])}
+    subtopics = roadmap.get('subtopics', [])
+    for subtopic in subtopics:
+        if subtopic.get('week_id') in weeks:
+            weeks[subtopic.get('week_id')].append(subtopic.get('id'))
+    return {
+        'week_count': len(roadmap.get('weeks', [])),
+        'total_subtopics': len(subtopics),
+        'weeks': [{'id': week_id, 'subtopic_ids': ids} for week_id, ids in weeks.items()],
+    }
+
+
+def get_stats(db, syllabus_id: str):
+    """
+    Статистика силлабуса из кэша процесса или из поля stats; None, если силлабуса нет.
+    Кэш используется, только если roadmap_version в базе не изменилась.
+    У старых документов stats считаются по проекции roadmap и сохраняются.
+    """
+    collection = db['syllabus']
+    document = collection.find_one({'id': syllabus_id}, VERSION_PROJECTION)
+    if document is None:
+        return None
+    stats = _cache.get((syllabus_id, document.get('roadmap_version', 0)))
+    if stats is not None:
+        return stats
+    document = collection.find_one({'id': syllabus_id}, STATS_PROJECTION)
+    if document is None:
+        return None
+    stats = document.get('stats')
+    if stats is None:
+        stats = compute_stats(collection.find_one({'id': syllabus_id}, LEGACY_PROJECTION).get('roadmap', {}))
+        collection.update_one({'id': syllabus_id}, {'$set': {'stats': stats}})
+    _cache.set((syllabus_id, document.get('roadmap_version', 0)), stats)
+    return stats
+
+
+def invalidate_stats(*syllabus_ids):
+    """
+    Сбрасывает кэш процесса для силлабусов, у которых stats пересчитали без смены roadmap_version.
+    """
+    syllabus_ids = set(syllabus_ids)
+    for key in [key for key in _cache.keys() if key[0] in syllabus_ids]:
+        _cache.pop(key)
+
+
+def week_progress(stats: dict, completed_topics: list) -> list:
+    """
+    Прогресс по неделям: [{'week_id', 'completed', 'total', 'progress'}], progress — проценты.
+    """
+    completed = set(completed_topics or [])
+    result = []
+    for week in (stats or {}).get('weeks', []):
+        total = len(week['subtopic_ids'])
+        done = sum(1 for topic_id in week['subtopic_ids'] if topic_id in completed)
+        result.append({'week_id': week['id'], 'completed': done, 'total': total,
+                       'progress': round(done / total * 100) if total else 0})
+    return result
@@ -0,0 +1,166 @@
+import re
+
+from django.utils.html import escape
+from pymongo.errors import OperationFailure
+
+from .indexes import ensure_indexes_once
+
+# Полнотекстовый поиск по силлабусам: текстовый индекс MongoDB с русской
+# морфологией (стемминг), ранжирование по textScore и подсветка совпадений.
+# Если текстовый поиск ничего не нашёл (например, слово набрано не до конца),
+# первая страница ищет по началу названия предмета — это диапазон по индексу
+# roadmap.subject.label, а не просмотр всей коллекции.
+
+# Поля текстового индекса (сам индекс объявлен в indexes.py)
+SEARCH_FIELDS = (
+    'roadmap.subject.label',
+    'roadmap.subject.description',
+    'roadmap.weeks.main_topic',
+    'roadmap.subtopics.label',
+)
+
+SEARCH_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'upload_date': 1,
+    'processed': 1,
+    'roadmap.subject.label': 1,
+    'roadmap.subject.description': 1,
+    'roadmap.weeks.main_topic': 1,
+    'roadmap.subtopics.label': 1,
+}
+
+SEARCH_MODES = ('text', 'prefix')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_HIGHLIGHTS = 3
+SNIPPET_RADIUS = 60
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+def _fold(text: str) -> str:
+    return text.lower().replace('ё', 'е')
+
+
+def _term_stems(query: str) -> list:
+    """
+    Грубые основы слов запроса для подсветки: окончания в русском языке короткие,
+    поэтому совпадением считается слово, начинающееся с основы.
+    """
+    stems = []
+    for word in WORD_RE.findall(_fold(query)):
+        stems.append(word if len(word) <= 4 else word[:max(4, len(word) - 2)])
+    return stems
+
+
+def _highlight(text: str, stems: list):
+    """
+    Фрагмент текста вокруг первого совпадения с подсвеченными словами (<mark>) или None.
+    """
+    matches = [match for match in WORD_RE.finditer(text)
+               if any(_fold(match.group()).startswith(stem) for stem in stems)]
+    if not matches:
+        return None
+    start = max(0, matches[0].start() - SNIPPET_RADIUS)
+    end = min(len(text), matches[0].end() + SNIPPET_RADIUS)
+    parts = ['…' if start else '']
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append('<mark>%s</mark>' % escape(match.group()))
+        position = match.end()
+    parts.append(escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
+
+
+def _highlights(syllabus: dict, stems: list) -> list:
+    roadmap = syllabus.get('roadmap', {})
+    subject = roadmap.get('subject', {})
+    sources = [('title', subject.get('label', '')), ('description', subject.get('description', ''))]
+    sources += [('week', week.get('main_topic', '')) for week in roadmap.get('weeks', [])]
+    sources += [('subtopic', subtopic.get('label', '')) for subtopic in roadmap.get('subtopics', [])]
+
+    highlights = []
+    seen = set()
+    for field, text in sources:
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        snippet = _highlight(text, stems)
+        if snippet:
+            highlights.append({'field': field, 'snippet': snippet})
+            if len(highlights) == MAX_HIGHLIGHTS:
+                break
+    return highlights
+
+
+def _text_search(collection, query: str, offset: int, limit: int) -> list:
+    projection = dict(SEARCH_PROJECTION, score={'$meta': 'textScore'})
+    cursor = collection.find({'$text': {'$search': query}}, projection) \
+        .sort([('score', {'$meta': 'textScore'})]).skip(offset).limit(limit + 1)
+    return list(cursor)
+
+
+def prefix_patterns(text: str) -> list:
+    """
+    Шаблоны «начинается с text» для условия $in. Регулярное выражение с ^ и без
+    флага i превращается в диапазон ключей индекса; регистр первой буквы
+    перебирается явно, так как названия и темы обычно пишутся с заглавной.
+    """
+    prefixes = {text, text[:1].upper() + text[1:], text[:1].lower() + text[1:]}
+    return [re.compile('^' + re.escape(prefix)) for prefix in sorted(prefixes)]
+
+
+def _prefix_search(collection, query: str, offset: int, limit: int) -> list:
+    search_filter = {'roadmap.subject.label': {'$in': prefix_patterns(query)}}
+    cursor = collection.find(search_filter, SEARCH_PROJECTION) \
+        .sort('roadmap.subject.label', 1).skip(offset).limit(limit + 1)
+    return list(cursor)
+
+
+def search_syllabi(db, query: str, page: int = 1, limit: int = DEFAULT_LIMIT, mode: str = None) -> dict:
+    """
+    Ищет силлабусы по названию, описанию, темам недель и подтемам.
+    Возвращает {'results', 'page', 'has_more', 'mode'}; mode — 'text' или 'prefix'.
+    Режим выбирается на первой странице; следующие страницы запрашиваются
+    с mode из её ответа, поэтому пустая дальняя страница означает конец выдачи.
+    """
+    collection = db['syllabus']
+    limit = max(1, min(limit, MAX_LIMIT))
+    page = max(1, page)
+    offset = (page - 1) * limit
+    if mode not in SEARCH_MODES:
+        mode = None
+
+    documents = []
+    if mode != 'prefix':
+        try:
+            ensure_indexes_once(db, 'syllabus')
+            documents = _text_search(collection, query, offset, limit)
+        except OperationFailure:
+            documents = []
+            if mode is None:
+                mode = 'prefix'
+    if mode is None:
+        mode = 'text' if documents or page > 1 else 'prefix'
+    if mode == 'prefix':
+        documents = _prefix_search(collection, query, offset, limit)
+
+    stems = _term_stems(query)
+    results = []
+    for syllabus in documents[:limit]:
+        subject = syllabus.get('roadmap', {}).get('subject', {})
+        results.append({
+            'id': syllabus['id'],
+            'title': subject.get('label', ''),
+            'description': subject.get('description', ''),
+            'upload_date': str(syllabus.get('upload_date', '')),
+            'processed': syllabus.get('processed', False),
+            'score': round(syllabus.get('score', 0), 4),
+            'highlights': _highlights(syllabus, stems),
+        })
+    return {'results': results, 'page': page, 'has_more': len(documents) > limit, 'mode': mode}
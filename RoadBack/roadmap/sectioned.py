@@ -0,0 +1,186 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .parser import (
+    structure_data_with_gpt, complete_json_with_gpt,
+    SUBJECT_PROMPT_TEMPLATE, WEEKS_SECTION_PROMPT_TEMPLATE, SECTION_MAX_TOKENS,
+)
+from .structure import TOTAL_WEEKS, merge_week_parts, week_number
+from .json_stream import is_valid_item
+
+DESCRIPTION_MARKER = 'краткое описание курса'
+PLAN_MARKER = 'тематический план по неделям'
+LITERATURE_MARKER = 'список литературы'
+LITERATURE_END_MARKER = 'политика академической честности'
+
+# Строка-маркер недели в таблице плана: "1", "1-3", "4 – 5", "6 неделя"
+WEEK_MARKER_RE = re.compile(r'^(\d{1,2})(?:\s*[-–—]\s*(\d{1,2}))?(?:\s*нед(?:еля|\.)?)?$', re.IGNORECASE)
+
+MAX_SUBJECT_CHARS = 4000
+MAX_ROW_CHARS = 3000
+MAX_LITERATURE_CHARS = 4000
+
+
+def _find_line(lines, marker, start=0):
+    for idx in range(start, len(lines)):
+        if marker in lines[idx].lower():
+            return idx
+    return -1
+
+
+def _block(lines, start_marker, end_marker, limit):
+    start = _find_line(lines, start_marker)
+    if start == -1:
+        return ''
+    end = _find_line(lines, end_marker, start + 1)
+    block = '\n'.join(lines[start:end if end != -1 else len(lines)])
+    return block[:limit]
+
+
+def _week_rows(lines):
+    """
+    Находит строки таблицы плана по маркерам недель. Номера должны идти
+    по неубыванию, чтобы случайные числа (баллы, страницы) не считались неделями.
+    """
+    markers = []
+    last_week = 0
+    for idx, line in enumerate(lines):
+        match = WEEK_MARKER_RE.match(line.strip())
+        if not match:
+            continue
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if first < last_week or first < 1 or last > TOTAL_WEEKS or last < first:
+            continue
+        markers.append((idx, first, last))
+        last_week = last
+
+    rows = []
+    for pos, (idx, first, last) in enumerate(markers):
+        end = markers[pos + 1][0] if pos + 1 < len(markers) else len(lines)
+        text = '\n'.join(lines[idx:end])[:MAX_ROW_CHARS]
+        rows.append({'first_week': first, 'last_week': last, 'text': text})
+    return rows
+
+
+def split_syllabus_sections(text: str, weeks_per_section: int) -> dict:
+    """
+    Делит текст силлабуса на секции: описание курса, диапазоны недель
+    тематического плана (не больше weeks_per_section недель в секции) и литературу.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+    description = _block(lines, DESCRIPTION_MARKER, PLAN_MARKER, MAX_SUBJECT_CHARS)
+    # Название предмета обычно в шапке документа
+    header = '\n'.join(lines[:40])
+    subject_text = (header + '\n' + description)[:MAX_SUBJECT_CHARS]
+    literature = _block(lines, LITERATURE_MARKER, LITERATURE_END_MARKER, MAX_LITERATURE_CHARS)
+
+    plan_sections = []
+    for row in _week_rows(lines):
+        current = plan_sections[-1] if plan_sections else None
+        if current and row['last_week'] - current['first_week'] < weeks_per_section:
+            current['last_week'] = row['last_week']
+            current['text'] += '\n' + row['text']
+        else:
+            plan_sections.append(dict(row))
+    if plan_sections:
+        plan_sections[0]['first_week'] = 1
+        plan_sections[-1]['last_week'] = TOTAL_WEEKS
+
+    return {'subject': subject_text, 'literature': literature, 'plan': plan_sections}
+
+
+def _structure_subject(section_text):
+    data = complete_json_with_gpt(SUBJECT_PROMPT_TEMPLATE.format(text=section_text), SECTION_MAX_TOKENS)
+    subject = data.get('subject', data)
+    if not subject.get('label'):
+        raise ValueError("GPT не вернул название предмета")
+    return {'label': subject['label'], 'description': subject.get('description', '')}
+
+
+def _structure_weeks(section, literature):
+    prompt = WEEKS_SECTION_PROMPT_TEMPLATE.format(
+        first_week=section['first_week'], last_week=section['last_week'],
+        text=section['text'], literature=literature or 'Нет данных'
+    )
+    data = complete_json_with_gpt(prompt, SECTION_MAX_TOKENS)
+    if 'weeks' not in data or 'subtopics' not in data:
+        raise ValueError(f"GPT не вернул 'weeks' и 'subtopics' для недель {section['first_week']}-{section['last_week']}")
+    return data
+
+
+def structure_sectioned_with_gpt(text: str, on_item=None) -> dict:
+    """
+    Структурирует силлабус параллельными запросами к GPT по секциям.
+    Повторно отправляются только секции, завершившиеся ошибкой.
+    Предмет и недели готовых секций сразу передаются в on_item(kind, item), подтемы —
+    после сборки roadmap, когда у них уже окончательные сквозные id.
+    Если план по неделям в тексте не найден, используется обычный однопроходный режим.
+    """
+    sections = split_syllabus_sections(text, settings.GPT_SECTION_WEEKS)
+    if not sections['plan']:
+        return structure_data_with_gpt(text, on_item)
+
+    tasks = {'subject': lambda: _structure_subject(sections['subject'])}
+    for section in sections['plan']:
+        key = (section['first_week'], section['last_week'])
+        tasks[key] = (lambda s=section: _structure_weeks(s, sections['literature']))
+
+    results = {}
+    errors = {}
+    pending = list(tasks)
+    with ThreadPoolExecutor(max_workers=settings.GPT_SECTION_CONCURRENCY) as executor:
+        for attempt in range(settings.GPT_SECTION_RETRIES + 1):
+            futures = {key: executor.submit(tasks[key]) for key in pending}
+            pending = []
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"Ошибка структурирования секции {key} (попытка {attempt + 1}): {str(e)}")
+                    errors[key] = e
+                    pending.append(key)
+                    continue
+                errors.pop(key, None)
+                # Ошибки on_item не относятся к ответу GPT и не должны вызывать повтор секции
+                if on_item:
+                    _emit_section(on_item, key, results[key])
+            if not pending:
+                break
+
+    if errors:
+        raise ValueError(f"Не удалось структурировать секции {sorted(map(str, errors))}: {next(iter(errors.values()))}")
+
+    week_parts = [(results[key]['weeks'], results[key]['subtopics'], key[0], key[1]) for key in tasks if key != 'subject']
+    structured_data = merge_week_parts(results['subject'], week_parts)
+    if on_item:
+        for subtopic in structured_data['roadmap']['subtopics']:
+            on_item('subtopic', subtopic)
+    return structured_data
+
+
+def _emit_section(on_item, key, result):
+    if key == 'subject':
+        on_item('subject', result)
+        return
+    first_week, last_week = key
+    for week in result['weeks']:
+        number = week_number(week)
+        if number is None or not first_week <= number <= last_week or not is_valid_item('week', week):
+            continue
+        # id и номер — как у недели в собранном roadmap, на них ссылаются подтемы
+        on_item('week', dict(week, id=f'week-{number}', week_number=number))
+
+
+def structure_syllabus(text: str, mode: str = None, on_item=None) -> dict:
+    """
+    Выбирает режим структурирования: 'single' — один запрос, 'sectioned' — параллельно по секциям,
+    'auto' — посекционно для текстов длиннее GPT_SECTIONED_MIN_CHARS.
+    """
+    mode = mode or settings.GPT_STRUCTURING_MODE
+    if mode == 'sectioned' or (mode == 'auto' and len(text) >= settings.GPT_SECTIONED_MIN_CHARS):
+        return structure_sectioned_with_gpt(text, on_item)
+    return structure_data_with_gpt(text, on_item)
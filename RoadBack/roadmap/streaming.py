@@ -0,0 +1,101 @@
+import json
+from itertools import chain
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Постраничная выдача коллекций: keyset-пагинация по _id, проекция полей
+# и потоковая сборка JSON прямо из курсора MongoDB, без списка документов в памяти.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CURSOR_BATCH_SIZE = 100
+
+
+def parse_page_params(params, allowed_fields, max_limit: int = MAX_PAGE_SIZE):
+    """
+    Разбирает GET-параметры after, limit и fields.
+    Возвращает (after, limit, projection); limit равен None, если пагинация не запрошена.
+    Бросает ValueError на неверные значения.
+    """
+    after = params.get('after')
+    if after:
+        try:
+            after = ObjectId(after)
+        except (InvalidId, TypeError):
+            raise ValueError('Неверный курсор after')
+    else:
+        after = None
+
+    limit = params.get('limit')
+    if limit not in (None, ''):
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit должен быть числом')
+        if limit < 1:
+            raise ValueError('limit должен быть больше нуля')
+        limit = min(limit, max_limit)
+    elif after is not None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        limit = None
+
+    projection = None
+    fields = [field.strip() for field in params.get('fields', '').split(',') if field.strip()]
+    if fields:
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Недопустимые поля: {', '.join(unknown)}")
+        # MongoDB отклоняет проекцию, где есть и поле, и его вложенное поле
+        overlapping = sorted({child for child in fields for parent in fields if child.startswith(parent + '.')})
+        if overlapping:
+            raise ValueError(f"Поля пересекаются с родительскими: {', '.join(overlapping)}")
+        projection = dict.fromkeys(fields, 1)
+    return after, limit, projection
+
+
+def keyset_cursor(collection, query: dict, after, limit, projection=None):
+    """
+    Курсор по возрастанию _id начиная после after. Запрашивается на один документ
+    больше limit, чтобы без отдельного count узнать, есть ли следующая страница.
+    """
+    if after is not None:
+        query = {'$and': [query, {'_id': {'$gt': after}}]} if query else {'_id': {'$gt': after}}
+    cursor = collection.find(query, projection).sort('_id', 1).batch_size(CURSOR_BATCH_SIZE)
+    if limit is not None:
+        cursor = cursor.limit(limit + 1)
+    return cursor
+
+
+def prefetch(cursor):
+    """
+    Читает первый документ курсора сразу, чтобы ошибка запроса проявилась
+    до начала потокового ответа, а не обрывом уже отправленного JSON.
+    Возвращает итератор по всем документам, включая первый.
+    """
+    first = next(cursor, None)
+    return chain([first], cursor) if first is not None else iter(())
+
+
+def stream_json_page(cursor, key: str, limit=None):
+    """
+    Генератор байтов JSON вида {key: [...], "next_after": ...}. Документы сериализуются
+    по одному по мере чтения из курсора; ObjectId и даты превращаются в строки.
+    next_after добавляется только при пагинации и равен null на последней странице.
+    """
+    yield ('{"%s": [' % key).encode('utf-8')
+    last_id = None
+    count = 0
+    has_more = False
+    for document in cursor:
+        if limit is not None and count == limit:
+            has_more = True
+            break
+        last_id = document['_id']
+        yield (', ' if count else '').encode('utf-8') + json.dumps(document, default=str).encode('utf-8')
+        count += 1
+    tail = ']'
+    if limit is not None:
+        tail += ', "next_after": %s' % json.dumps(str(last_id) if has_more else None)
+    yield (tail + '}').encode('utf-8')
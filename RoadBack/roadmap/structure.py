@@ -0,0 +1,70 @@
+TOTAL_WEEKS = 15
+
+
+def assemble_roadmap(subject: dict, weeks_by_number: dict, subtopics_by_week: dict) -> dict:
+    """
+    Собирает объект roadmap из недель и подтем, сгруппированных по номеру недели:
+    не меньше 15 недель, цепочка next_week_id и сквозная нумерация подтем.
+    Недостающие недели заполняются минимальными значениями по теме курса.
+    """
+    last_week = max([TOTAL_WEEKS] + list(weeks_by_number) + list(subtopics_by_week))
+
+    weeks = []
+    subtopics = []
+    for number in range(1, last_week + 1):
+        week = weeks_by_number.get(number, {})
+        weeks.append({
+            'id': f'week-{number}',
+            'week_number': number,
+            'main_topic': week.get('main_topic') or subject['label'],
+            'description': week.get('description', ''),
+            'next_week_id': f'week-{number + 1}' if number < last_week else None,
+        })
+        for subtopic in subtopics_by_week.get(number, []):
+            subtopics.append({
+                'id': f'subtopic-{len(subtopics) + 1}',
+                'week_id': f'week-{number}',
+                'label': subtopic.get('label', ''),
+                'description': subtopic.get('description', ''),
+                'material': subtopic.get('material', ''),
+                'assignment': subtopic.get('assignment', ''),
+            })
+
+    return {'roadmap': {'subject': subject, 'weeks': weeks, 'subtopics': subtopics}}
+
+
+def week_number(week: dict):
+    """
+    Номер недели из week_number или id вида 'week-3'; GPT может вернуть строку "3" или null.
+    None, если номер не удаётся определить.
+    """
+    try:
+        return int(week.get('week_number') or str(week.get('id', '')).replace('week-', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_week_parts(subject: dict, parts: list) -> dict:
+    """
+    Собирает roadmap из частей, полученных от GPT: parts — список
+    (weeks, subtopics, first_week, last_week). Из каждой части берутся только недели
+    её диапазона, подтемы привязываются к неделям по week_id.
+    """
+    weeks_by_number = {}
+    subtopics_by_week = {}
+    for weeks, subtopics, first_week, last_week in parts:
+        local_ids = {}
+        for week in weeks:
+            number = week_number(week)
+            if number is None:
+                continue
+            if first_week <= number <= last_week and number not in weeks_by_number:
+                weeks_by_number[number] = week
+                local_ids[week.get('id')] = number
+                local_ids[f'week-{number}'] = number
+        for subtopic in subtopics:
+            number = local_ids.get(subtopic.get('week_id'))
+            if number is not None:
+                subtopics_by_week.setdefault(number, []).append(subtopic)
+
+    return assemble_roadmap(subject, weeks_by_number, subtopics_by_week)
@@ -1,3 +1,163 @@
-from django.test import TestCase
+import time
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from .enrollments import (change_completed_topics, enroll, parse_sync_changes, set_completed_topics,
+                          sync_progress, unenroll)
+
+MONGO_URI = 'mongodb://localhost:27017/'
+THREADS = 16
+
+
+class ConcurrentProgressTests(SimpleTestCase):
+    """
+    Одновременные изменения прогресса (как с сайта и из приложения сразу) не должны теряться.
+    Нужен запущенный MongoDB; без него тесты пропускаются.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+        try:
+            cls.client.admin.command('ping')
+        except PyMongoError:
+            cls.client.close()
+            raise unittest.SkipTest('MongoDB недоступен')
+        cls.db = cls.client[f'roadmap_test_{uuid.uuid4().hex[:8]}']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.drop_database(cls.db.name)
+        cls.client.close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.db['users'].delete_many({})
+        self.db['syllabus'].delete_many({})
+        self.db['users'].insert_one({'username': 'student', 'user_progress': []})
+        for syllabus_id in ('philosophy', 'history'):
+            self.db['syllabus'].insert_one({'id': syllabus_id, 'enrollment_count': 0, 'stats': {
+                'week_count': 1, 'total_subtopics': 4,
+                'weeks': [{'id': 'week-1', 'subtopic_ids': ['t1', 't2', 't3', 't4']}],
+            }})
+
+    def _progress(self, syllabus_id):
+        user = self.db['users'].find_one({'username': 'student'})
+        return [item for item in user['user_progress'] if item['syllabus_id'] == syllabus_id]
+
+    def _enrollment_count(self, syllabus_id):
+        return self.db['syllabus'].find_one({'id': syllabus_id})['enrollment_count']
+
+    def test_concurrent_enroll_adds_course_once(self):
+        with ThreadPoolExecutor(THREADS) as pool:
+            added = list(pool.map(lambda _: enroll(self.db, 'student', 'philosophy'), range(THREADS)))
+        self.assertEqual(sum(added), 1)
+        self.assertEqual(len(self._progress('philosophy')), 1)
+        self.assertEqual(self._enrollment_count('philosophy'), 1)
+
+    def test_concurrent_topic_marks_are_not_lost(self):
+        enroll(self.db, 'student', 'philosophy')
+        topics = [f'topic-{i}' for i in range(THREADS * 4)]
+        total = len(topics) * 2
+
+        def mark(topic):
+            change_completed_topics(self.db, 'student', 'philosophy', [topic], [], total)
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            list(pool.map(mark, topics))
+        entry, = self._progress('philosophy')
+        self.assertCountEqual(entry['completed_topics'], topics)
+        self.assertEqual(entry['progress'], 50)
+
+    def test_concurrent_marks_and_unmarks(self):
+        enroll(self.db, 'student', 'philosophy', ['keep', 'drop-0', 'drop-1'], 10)
+        jobs = [(['new-0'], []), (['new-1'], []), ([], ['drop-0']), ([], ['drop-1'])] * THREADS
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            list(pool.map(lambda job: change_completed_topics(self.db, 'student', 'philosophy', *job, 10), jobs))
+        entry, = self._progress('philosophy')
+        self.assertCountEqual(entry['completed_topics'], ['keep', 'new-0', 'new-1'])
+        self.assertEqual(entry['progress'], 30)
+
+    def test_updates_to_different_courses_do_not_overwrite_each_other(self):
+        enroll(self.db, 'student', 'philosophy')
+        enroll(self.db, 'student', 'history')
+
+        def work(i):
+            if i % 3 == 0:
+                set_completed_topics(self.db, 'student', 'history', ['h1', 'h2'], 4)
+            elif i % 3 == 1:
+                change_completed_topics(self.db, 'student', 'philosophy', [f'p{i}'], [], 100)
+            else:
+                enroll(self.db, 'student', 'history')
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            list(pool.map(work, range(THREADS * 3)))
+        philosophy, = self._progress('philosophy')
+        history, = self._progress('history')
+        self.assertEqual(len(philosophy['completed_topics']), THREADS)
+        self.assertEqual(history['completed_topics'], ['h1', 'h2'])
+        self.assertEqual(history['progress'], 50)
+        self.assertEqual(self._enrollment_count('history'), 1)
+
+    def test_unenroll_decrements_once(self):
+        enroll(self.db, 'student', 'philosophy')
+        with ThreadPoolExecutor(THREADS) as pool:
+            removed = list(pool.map(lambda _: unenroll(self.db, 'student', 'philosophy'), range(THREADS)))
+        self.assertEqual(sum(removed), 1)
+        self.assertEqual(self._progress('philosophy'), [])
+        self.assertEqual(self._enrollment_count('philosophy'), 0)
+
+    def test_sync_keeps_latest_change_per_topic(self):
+        now = int(time.time() * 1000)
+
+        def sync(*changes):
+            items = [{'syllabus_id': 'philosophy', 'topic_id': topic, 'completed': completed, 'ts': now + offset}
+                     for topic, completed, offset in changes]
+            return sync_progress(self.db, 'student', parse_sync_changes(items, 100))
+
+        # Два устройства присылают пересекающиеся пакеты в произвольном порядке
+        batches = [
+            [('t1', True, -5000), ('t2', True, -5000)],
+            [('t1', False, -3000), ('t3', True, -3000)],
+            [('t2', False, -6000), ('t3', False, -4000)],
+        ]
+        sync(*batches[0])
+        with ThreadPoolExecutor(THREADS) as pool:
+            list(pool.map(lambda batch: sync(*batch), batches[1:] * THREADS))
+        entry, = self._progress('philosophy')
+        self.assertCountEqual(entry['completed_topics'], ['t2', 't3'])
+        self.assertEqual(entry['progress'], 50)
+        self.assertEqual(self._enrollment_count('philosophy'), 1)
+
+    def test_sync_does_not_reenroll_with_changes_older_than_unenroll(self):
+        now = int(time.time() * 1000)
+        enroll(self.db, 'student', 'philosophy')
+        unenroll(self.db, 'student', 'philosophy')
+
+        def sync(offset):
+            items = [{'syllabus_id': 'philosophy', 'topic_id': 't1', 'completed': True, 'ts': now + offset}]
+            return sync_progress(self.db, 'student', parse_sync_changes(items, 100))
+
+        # Отметка сделана офлайн до отписки и пришла позже неё
+        self.assertEqual(sync(-60000)['applied'], 0)
+        self.assertEqual(self._progress('philosophy'), [])
+        self.assertEqual(self._enrollment_count('philosophy'), 0)
+
+    def test_sync_does_not_override_newer_full_list_edit(self):
+        enroll(self.db, 'student', 'philosophy', ['t1'], 4)
+        queued_at = int(time.time() * 1000) - 60000
+        # С сайта список тем заменён целиком уже после офлайн-изменений в приложении
+        set_completed_topics(self.db, 'student', 'philosophy', ['t2'], 4)
+        items = [{'syllabus_id': 'philosophy', 'topic_id': 't1', 'completed': True, 'ts': queued_at},
+                 {'syllabus_id': 'philosophy', 'topic_id': 't2', 'completed': False, 'ts': queued_at}]
+        sync_progress(self.db, 'student', parse_sync_changes(items, 100))
+        entry, = self._progress('philosophy')
+        self.assertEqual(entry['completed_topics'], ['t2'])
+        self.assertEqual(entry['progress'], 25)
@@ -0,0 +1,112 @@
+import math
+
+from .docx_stream import load_content, Paragraph
+
+try:
+    import tiktoken
+except ImportError:  # без tiktoken количество токенов оценивается по длине текста
+    tiktoken = None
+
+# Подготовка текста силлабуса перед отправкой в GPT: только разделы, которые
+# использует промпт, без дублей объединённых ячеек и типового текста политик.
+
+# Разделы, которые нужны промпту структурирования
+KEPT_SECTIONS = (
+    'краткое описание курса',
+    'тематический план',
+    'список литературы',
+)
+
+# Разделы, которые промпт не использует: политики, правила оценивания и т.п.
+DROPPED_SECTIONS = (
+    'цель курса',
+    'ожидаемые результаты',
+    'методы обучения',
+    'политика',
+    'правила',
+    'критерии оценивания',
+    'система оценивания',
+    'шкала оценивания',
+    'оценивание',
+)
+
+MAX_HEADING_CHARS = 120
+# Повторы строк короче этого порога (баллы, номера недель) не считаются шаблонным текстом
+MIN_DEDUP_CHARS = 40
+
+TOKEN_MODEL = 'gpt-4o'
+CHARS_PER_TOKEN = 3
+
+
+def count_tokens(text: str) -> int:
+    """
+    Количество токенов текста для модели структурирования; без tiktoken — оценка.
+    """
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.encoding_for_model(TOKEN_MODEL).encode(text))
+        except KeyError:
+            pass
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _section_of(text: str):
+    lowered = text.lower()
+    if len(lowered) > MAX_HEADING_CHARS:
+        return None
+    for marker in KEPT_SECTIONS:
+        if lowered.startswith(marker):
+            return 'keep'
+    for marker in DROPPED_SECTIONS:
+        if lowered.startswith(marker):
+            return 'drop'
+    return None
+
+
+def _table_lines(table):
+    for row in table.rows:
+        previous = None
+        # row.cells содержит каждую объединённую ячейку один раз
+        for cell in row.cells:
+            text = cell.text
+            if text and text != previous:
+                yield text
+            previous = text
+
+
+def prepare_prompt_text(content_or_path) -> str:
+    """
+    Собирает текст для промпта в порядке документа: шапка (название предмета),
+    описание курса, тематический план и литература. Объединённые ячейки
+    берутся один раз, разделы политик и оценивания отбрасываются,
+    повторяющиеся длинные строки оставляются в первом вхождении.
+    """
+    content = load_content(content_or_path)
+    has_sections = any(isinstance(block, Paragraph) and _section_of(block.text.strip()) == 'keep'
+                       for block in content.blocks)
+
+    lines = []
+    seen = set()
+    keep = True
+    for block in content.blocks:
+        if isinstance(block, Paragraph):
+            text = block.text.strip()
+            if not text:
+                continue
+            section = _section_of(text)
+            if section and has_sections:
+                keep = section == 'keep'
+            candidates = [text]
+        else:
+            candidates = _table_lines(block)
+
+        if not keep:
+            continue
+        for text in candidates:
+            if len(text) >= MIN_DEDUP_CHARS:
+                if text in seen:
+                    continue
+                seen.add(text)
+            lines.append(text)
+
+    return '\n'.join(lines)
@@ -6,9 +6,11 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 urlpatterns = [
     #path('process-syllabus/', process_syllabus, name='process_syllabus'),
     path('upload/', upload_syllabus, name='upload_syllabus'),
+    path('api/ingestion-jobs/<str:job_id>/', views.ingestion_job_status, name='ingestion_job_status'),
     path('view-db/', view_db, name='view_db'),
     path('subjects/', get_subjects, name='get_subjects'),
     path('roadmap/<str:subject_id>/', get_roadmap, name='get_roadmap'),
+    path('roadmap/<str:subject_id>/weeks/<str:week_id>/', views.get_roadmap_week, name='get_roadmap_week'),
     path('api/syllabus-list/', syllabus_list_api, name='syllabus_list_api'),
     path('api/user-syllabuses/', user_syllabuses_api, name='user_syllabuses_api'),
     # --- User/Auth ---
@@ -19,6 +21,10 @@ urlpatterns = [
     path('api/profile/', views.profile, name='api_profile'),
     path('api/profile/avatar/', views.upload_avatar, name='upload_avatar'),
     path('api/syllabus-search/', views.syllabus_search, name='syllabus_search'),
+    path('api/syllabus-catalog/', views.syllabus_catalog_api, name='syllabus_catalog_api'),
+    path('api/syllabus-autocomplete/', views.syllabus_autocomplete, name='syllabus_autocomplete'),
+    path('api/my-courses/', views.my_courses_api, name='my_courses_api'),
+    path('api/progress/sync/', views.progress_sync_api, name='progress_sync_api'),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     # --- GPT Test API ---
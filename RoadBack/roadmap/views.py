@@ -1,12 +1,29 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from pymongo.errors import DuplicateKeyError
 import os
-from .parser import extract_text_from_docx, structure_data_with_gpt, save_to_mongodb
+import time
+from .pipeline import SUPPORTED_EXTENSIONS, run_ingestion
+from .jobs import enqueue_syllabus, find_active_job, get_job
+from .fingerprint import store_upload
+from .catalog import get_catalog_json
 from .db import db
+from .roadmap_stats import get_stats, week_progress
+from .enrollments import (change_completed_topics, enroll, enrolled_courses, parse_sync_changes,
+                          set_completed_topics, sync_progress, unenroll)
+from .indexes import ensure_indexes_once
+from .auth import get_user, invalidate_user, jwt_required
+from .passwords import PasswordHasherBusy, RateLimited, admit, check_password, hash_password
+from .facets import faceted_catalog
+from .autocomplete import DEFAULT_SUGGESTIONS, suggest
+from .search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT, search_syllabi
+from .roadmap_cache import choose_encoding, ensure_roadmap_hash, etag_matches, get_roadmap_payloads, make_etag
+from .streaming import CURSOR_BATCH_SIZE, keyset_cursor, parse_page_params, prefetch, stream_json_page
 import json
-import bcrypt
 import jwt
 from datetime import datetime, timedelta
 import openai
@@ -19,42 +36,79 @@ SECRET_KEY = settings.SECRET_KEY
 JWT_ALGORITHM = 'HS256'
 JWT_EXP_DELTA_DAYS = 7
 
+# Поля, которые можно запросить через fields= в syllabus_list_api
+SYLLABUS_LIST_FIELDS = (
+    'id', 'file_path', 'upload_date', 'processed', 'source_hash', 'roadmap_version',
+    'roadmap', 'roadmap.subject', 'roadmap.subject.label', 'roadmap.subject.description',
+    'roadmap.weeks', 'roadmap.subtopics',
+)
+# Поля, которые выводит шаблон view_db.html
+VIEW_DB_PROJECTION = {'_id': 0, 'id': 1, 'roadmap': 1, 'file_path': 1, 'upload_date': 1, 'processed': 1}
+
 @csrf_exempt
 def get_subjects(request):
     try:
-        syllabus_data = list(db['syllabus'].find())
-        subjects = []
-        for item in syllabus_data:
-            subjects.append({
-                'id': item['id'],
-                'title': item['roadmap']['subject']['label'],
-                'description': item['roadmap']['subject']['description'],
-                'progress': item['roadmap']['subject'].get('progress', 0)
-            })
-        return JsonResponse({'subjects': subjects}, safe=False)
+        # Каталог хранится отдельно и отдаётся готовыми байтами JSON
+        return HttpResponse(get_catalog_json(db), content_type='application/json')
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
+def _cached_roadmap_response(request, subject_id, view='full', week_id=None):
+    """
+    Ответ с roadmap из кэша в памяти с поддержкой ETag/If-None-Match и сжатия.
+    """
+    # Для проверки ETag читается только хэш, без тела roadmap
+    meta = db['syllabus'].find_one({'id': subject_id}, {'_id': 0, 'id': 1, 'roadmap_hash': 1})
+    if not meta:
+        return JsonResponse({'status': 'error', 'message': 'Subject not found'}, status=404)
+
+    roadmap_hash = meta.get('roadmap_hash') or ensure_roadmap_hash(db, subject_id)
+    etag_view = view if week_id is None else f'{view}-{week_id}'
+    etag = make_etag(roadmap_hash, etag_view)
+
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = HttpResponse(status=304)
+    else:
+        loaded = get_roadmap_payloads(db, subject_id, roadmap_hash, view, week_id, settings.ROADMAP_CACHE_SIZE)
+        if loaded is None:
+            message = 'Week not found' if view == 'week' else 'Subject not found'
+            return JsonResponse({'status': 'error', 'message': message}, status=404)
+        payloads, body_hash = loaded
+        # Тело могло прийти уже от более новой версии roadmap — ETag должен описывать именно его
+        etag = make_etag(body_hash, etag_view)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        response = HttpResponse(payloads[encoding], content_type='application/json')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.ROADMAP_CACHE_MAX_AGE}, must-revalidate'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
 @csrf_exempt
 def get_roadmap(request, subject_id):
+    """
+    Полный roadmap предмета; ?view=outline — только предмет и заголовки недель с числом подтем.
+    """
+    view = request.GET.get('view', 'full')
+    if view not in ('full', 'outline'):
+        return JsonResponse({'status': 'error', 'message': 'view must be full or outline'}, status=400)
     try:
-        syllabus = db['syllabus'].find_one({'id': subject_id})
-        if not syllabus:
-            return JsonResponse({'status': 'error', 'message': 'Subject not found'}, status=404)
-
-        roadmap = syllabus['roadmap']
-
-        response_data = {
-            'roadmap': {
-                'subject': roadmap['subject'],
-                'weeks': roadmap['weeks'],
-                'subtopics': roadmap['subtopics']
-            }
-        }
+        return _cached_roadmap_response(request, subject_id, view)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-        return JsonResponse(response_data)
 
+@csrf_exempt
+def get_roadmap_week(request, subject_id, week_id):
+    """
+    Одна неделя roadmap с её подтемами; next_week_id позволяет заранее загрузить следующую.
+    """
+    try:
+        return _cached_roadmap_response(request, subject_id, 'week', week_id)
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
@@ -78,34 +132,105 @@ def upload_syllabus(request):
     if request.method == 'POST':
         if 'syllabus_file' in request.FILES:
             syllabus_file = request.FILES['syllabus_file']
-            file_path = os.path.join(settings.MEDIA_ROOT, 'syllabus_files', syllabus_file.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'wb+') as destination:
-                for chunk in syllabus_file.chunks():
-                    destination.write(chunk)
+            if not syllabus_file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                return JsonResponse({'status': 'error', 'error': 'Поддерживаются только файлы .docx и .pdf'}, status=400)
+            # Хэш считается во время записи, файл хранится по содержимому
+            file_path, source_hash = store_upload(syllabus_file, os.path.join(settings.MEDIA_ROOT, 'syllabus_files'))
+
+            # Тот же файл уже обработан — возвращаем готовый roadmap без повторного разбора
+            reprocess = request.GET.get('reprocess', request.POST.get('reprocess', '')) in ['1', 'true', 'True']
+            if not reprocess:
+                existing = db['syllabus'].find_one({'source_hash': source_hash}, {'_id': 0, 'id': 1, 'roadmap': 1})
+                if existing:
+                    return JsonResponse({
+                        'status': 'ok',
+                        'message': 'Этот файл уже был обработан ранее',
+                        'duplicate': True,
+                        'syllabus_id': existing.get('id'),
+                        'subject': existing.get('roadmap', {}).get('subject', {}).get('label'),
+                        'roadmap': existing.get('roadmap'),
+                    })
+                active_job = find_active_job(source_hash)
+                if active_job:
+                    return JsonResponse({
+                        'status': 'queued',
+                        'job_id': active_job['id'],
+                        'status_url': reverse('ingestion_job_status', args=[active_job['id']]),
+                        'message': 'Этот файл уже обрабатывается'
+                    }, status=202)
+
+            options = {'source_hash': source_hash}
+            if 'generate_assignments' in request.POST:
+                options['generate_assignments'] = request.POST['generate_assignments'] in ['1', 'true', 'True']
+
+            # Синхронная обработка остаётся доступной: ?sync=1 или SYLLABUS_INGEST_ASYNC=False
+            sync = request.GET.get('sync', request.POST.get('sync', '')) in ['1', 'true', 'True']
+            if sync or not settings.SYLLABUS_INGEST_ASYNC:
+                try:
+                    result = run_ingestion(file_path, original_name=syllabus_file.name, **options)
+                    return JsonResponse({'status': 'ok', 'message': 'Силлабус успешно обработан и сохранён в базу данных!', **result})
+                except Exception as e:
+                    return JsonResponse({'status': 'error', 'error': f'Ошибка обработки: {str(e)}'}, status=500)
+
             try:
-                text = extract_text_from_docx(file_path)
-                structured_data = structure_data_with_gpt(text)
-                save_to_mongodb(structured_data, db, file_path)
-                return JsonResponse({'status': 'ok', 'message': 'Силлабус успешно обработан и сохранён в базу данных!'})
+                job_id = enqueue_syllabus(file_path, syllabus_file.name, options)
             except Exception as e:
-                return JsonResponse({'status': 'error', 'error': f'Ошибка обработки: {str(e)}'}, status=500)
+                return JsonResponse({'status': 'error', 'error': f'Ошибка постановки в очередь: {str(e)}'}, status=500)
+            return JsonResponse({
+                'status': 'queued',
+                'job_id': job_id,
+                'status_url': reverse('ingestion_job_status', args=[job_id]),
+                'message': 'Силлабус принят в обработку'
+            }, status=202)
         else:
             return JsonResponse({'status': 'error', 'error': 'Пожалуйста, выберите файл для загрузки.'}, status=400)
     return JsonResponse({'status': 'error', 'error': 'POST required'}, status=405)
 
 
-def view_db(request):
-    syllabus = list(db['syllabus'].find())
+@csrf_exempt
+def ingestion_job_status(request, job_id):
+    """API статуса и результата фоновой обработки силлабуса"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'GET required'}, status=405)
+    try:
+        job = get_job(job_id)
+        if not job:
+            return JsonResponse({'status': 'error', 'message': 'Job not found'}, status=404)
+        for field in ['created_at', 'updated_at', 'started_at', 'finished_at']:
+            if job.get(field):
+                job[field] = str(job[field])
+        return JsonResponse({'job': job})
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-    for item in syllabus:
-        item['_id'] = str(item['_id'])
 
+def view_db(request):
+    # Тег {% for %} всё равно собирает курсор в список, поэтому проекция
+    # оставляет в документах только поля, которые показывает шаблон
+    syllabus = db['syllabus'].find({}, VIEW_DB_PROJECTION).sort('_id', 1).batch_size(CURSOR_BATCH_SIZE)
     return render(request, 'view_db.html', {'syllabus': syllabus})
 
 
+def _too_many_requests(retry_after: int):
+    response = JsonResponse({'error': 'Too many attempts, try again later'}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _hasher_busy():
+    response = JsonResponse({'error': 'Server is busy, try again later'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+# pymongo потокобезопасен, поэтому запросы к базе из async view не сериализуются в одном потоке
+_find_user = sync_to_async(MONGO_USERS_COLLECTION.find_one, thread_sensitive=False)
+_insert_user = sync_to_async(MONGO_USERS_COLLECTION.insert_one, thread_sensitive=False)
+_ensure_user_indexes = sync_to_async(ensure_indexes_once, thread_sensitive=False)
+
+
 @csrf_exempt
-def login_view(request):
+async def login_view(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -115,8 +240,9 @@ def login_view(request):
             if not username or not password:
                 return JsonResponse({'error': 'Username and password are required'}, status=400)
             
-            user = MONGO_USERS_COLLECTION.find_one({'username': username})
-            if not user or not bcrypt.checkpw(password.encode(), user['password'].encode()):
+            admit(request, username)
+            user = await _find_user({'username': username}, {'_id': 0, 'username': 1, 'email': 1, 'password': 1})
+            if not user or not await check_password(password, user['password']):
                 return JsonResponse({'error': 'Invalid credentials'}, status=400)
             
             payload = {
@@ -134,12 +260,16 @@ def login_view(request):
             })
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except RateLimited as e:
+            return _too_many_requests(e.retry_after)
+        except PasswordHasherBusy:
+            return _hasher_busy()
         except Exception as e:
             return JsonResponse({'error': f'Server error: {str(e)}'}, status=500)
     return JsonResponse({'error': 'POST method required'}, status=405)
 
 @csrf_exempt
-def register(request):
+async def register(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -150,10 +280,11 @@ def register(request):
             if not username or not password:
                 return JsonResponse({'error': 'Username and password are required'}, status=400)
             
-            if MONGO_USERS_COLLECTION.find_one({'username': username}):
+            admit(request)
+            if await _find_user({'username': username}, {'_id': 1}):
                 return JsonResponse({'error': 'Username already exists'}, status=400)
             
-            hashed_pw = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+            hashed_pw = await hash_password(password)
             user_doc = {
                 'username': username,
                 'email': email,
@@ -161,7 +292,12 @@ def register(request):
                 'role': 'user',
                 'created_at': datetime.utcnow()
             }
-            MONGO_USERS_COLLECTION.insert_one(user_doc)
+            # Уникальные индексы username/email защищают от одновременной регистрации
+            await _ensure_user_indexes(db, MONGO_USERS_COLLECTION.name)
+            try:
+                await _insert_user(user_doc)
+            except DuplicateKeyError:
+                return JsonResponse({'error': 'Username or email already exists'}, status=400)
             return JsonResponse({
                 'status': 'ok', 
                 'user': {
@@ -172,32 +308,71 @@ def register(request):
             })
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except RateLimited as e:
+            return _too_many_requests(e.retry_after)
+        except PasswordHasherBusy:
+            return _hasher_busy()
         except Exception as e:
             return JsonResponse({'error': f'Server error: {str(e)}'}, status=500)
     return JsonResponse({'error': 'POST method required'}, status=405)
 
+def _profile_response(user):
+    return JsonResponse({
+        'username': user['username'],
+        'email': user.get('email', ''),
+        'avatarUrl': user.get('avatarUrl', ''),
+        'publicProfile': user.get('publicProfile', True),
+        'hideEmail': user.get('hideEmail', False),
+        'hideProgress': user.get('hideProgress', False),
+        'twoFactor': user.get('twoFactor', False),
+    })
+
+
+def _save_profile(user, data, files, password_hash):
+    """Записывает изменения профиля и настроек; пароль приходит уже захэшированным."""
+    update = {}
+    if 'username' in data:
+        update['username'] = data['username']
+    if 'email' in data:
+        update['email'] = data['email']
+    if 'publicProfile' in data:
+        update['publicProfile'] = data['publicProfile'] in [True, 'true', 'True', 1, '1']
+    if 'hideEmail' in data:
+        update['hideEmail'] = data['hideEmail'] in [True, 'true', 'True', 1, '1']
+    if 'hideProgress' in data:
+        update['hideProgress'] = data['hideProgress'] in [True, 'true', 'True', 1, '1']
+    if 'twoFactor' in data:
+        update['twoFactor'] = data['twoFactor'] in [True, 'true', 'True', 1, '1']
+    if password_hash:
+        update['password'] = password_hash
+    # Аватар (сохраняем base64 или url, если есть)
+    if files and 'avatar' in files:
+        avatar_file = files['avatar']
+        avatar_path = os.path.join(settings.MEDIA_ROOT, 'avatars', avatar_file.name)
+        os.makedirs(os.path.dirname(avatar_path), exist_ok=True)
+        with open(avatar_path, 'wb+') as dest:
+            for chunk in avatar_file.chunks():
+                dest.write(chunk)
+        update['avatarUrl'] = '/media/avatars/' + avatar_file.name
+    try:
+        MONGO_USERS_COLLECTION.update_one({'username': user['username']}, {'$set': update})
+    except DuplicateKeyError:
+        return JsonResponse({'error': 'Username or email already exists'}, status=400)
+    invalidate_user(user['username'], update.get('username'))
+    return _profile_response(get_user(update.get('username', user['username'])))
+
+
+_save_profile_async = sync_to_async(_save_profile, thread_sensitive=False)
+
+
 @csrf_exempt
-def profile(request):
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return JsonResponse({'error': 'Not authenticated'}, status=401)
-    token = auth_header.split(' ')[1]
+@jwt_required
+async def profile(request):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user = MONGO_USERS_COLLECTION.find_one({'username': payload['username']})
-        if not user:
-            return JsonResponse({'error': 'User not found'}, status=404)
+        user = request.auth_user
         if request.method == 'GET':
             # Возвращаем все настройки
-            return JsonResponse({
-                'username': user['username'],
-                'email': user.get('email', ''),
-                'avatarUrl': user.get('avatarUrl', ''),
-                'publicProfile': user.get('publicProfile', True),
-                'hideEmail': user.get('hideEmail', False),
-                'hideProgress': user.get('hideProgress', False),
-                'twoFactor': user.get('twoFactor', False),
-            })
+            return _profile_response(user)
         elif request.method == 'PUT':
             # Обновление профиля и настроек
             if request.content_type and request.content_type.startswith('multipart'):
@@ -206,60 +381,27 @@ def profile(request):
             else:
                 data = json.loads(request.body)
                 files = None
-            update = {}
-            if 'username' in data:
-                update['username'] = data['username']
-            if 'email' in data:
-                update['email'] = data['email']
-            if 'publicProfile' in data:
-                update['publicProfile'] = data['publicProfile'] in [True, 'true', 'True', 1, '1']
-            if 'hideEmail' in data:
-                update['hideEmail'] = data['hideEmail'] in [True, 'true', 'True', 1, '1']
-            if 'hideProgress' in data:
-                update['hideProgress'] = data['hideProgress'] in [True, 'true', 'True', 1, '1']
-            if 'twoFactor' in data:
-                update['twoFactor'] = data['twoFactor'] in [True, 'true', 'True', 1, '1']
+            password_hash = None
             if 'password' in data and data['password']:
-                update['password'] = bcrypt.hashpw(data['password'].encode(), bcrypt.gensalt()).decode()
-            # Аватар (сохраняем base64 или url, если есть)
-            if files and 'avatar' in files:
-                avatar_file = files['avatar']
-                avatar_path = os.path.join(settings.MEDIA_ROOT, 'avatars', avatar_file.name)
-                os.makedirs(os.path.dirname(avatar_path), exist_ok=True)
-                with open(avatar_path, 'wb+') as dest:
-                    for chunk in avatar_file.chunks():
-                        dest.write(chunk)
-                update['avatarUrl'] = '/media/avatars/' + avatar_file.name
-            MONGO_USERS_COLLECTION.update_one({'username': user['username']}, {'$set': update})
-            user = MONGO_USERS_COLLECTION.find_one({'username': update.get('username', user['username'])})
-            return JsonResponse({
-                'username': user['username'],
-                'email': user.get('email', ''),
-                'avatarUrl': user.get('avatarUrl', ''),
-                'publicProfile': user.get('publicProfile', True),
-                'hideEmail': user.get('hideEmail', False),
-                'hideProgress': user.get('hideProgress', False),
-                'twoFactor': user.get('twoFactor', False),
-            })
+                # bcrypt ждём асинхронно, не занимая поток обработки запросов
+                try:
+                    admit(request, user['username'])
+                    password_hash = await hash_password(data['password'])
+                except RateLimited as e:
+                    return _too_many_requests(e.retry_after)
+                except PasswordHasherBusy:
+                    return _hasher_busy()
+            return await _save_profile_async(user, data, files, password_hash)
         else:
             return JsonResponse({'error': 'Method not allowed'}, status=405)
-    except jwt.ExpiredSignatureError:
-        return JsonResponse({'error': 'Token expired'}, status=401)
     except Exception as e:
-        return JsonResponse({'error': 'Invalid token or server error: ' + str(e)}, status=401)
+        return JsonResponse({'error': 'Server error: ' + str(e)}, status=500)
 
 @csrf_exempt
+@jwt_required
 def profile_api(request):
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return JsonResponse({'error': 'Not authenticated'}, status=401)
-    
-    token = auth_header.split(' ')[1]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user = MONGO_USERS_COLLECTION.find_one({'username': payload['username']})
-        if not user:
-            return JsonResponse({'error': 'User not found'}, status=404)
+        user = request.auth_user
         
         if request.method == 'GET':
             return JsonResponse({
@@ -302,10 +444,15 @@ def profile_api(request):
                 'phone': data.get('phone', ''),
             }
             
-            MONGO_USERS_COLLECTION.update_one(
-                {'username': user['username']},
-                {'$set': update_data}
-            )
+            # Проверка выше отвечает понятной ошибкой, а уникальные индексы исключают гонку
+            try:
+                MONGO_USERS_COLLECTION.update_one(
+                    {'username': user['username']},
+                    {'$set': update_data}
+                )
+            except DuplicateKeyError:
+                return JsonResponse({'error': 'Username or email already exists'}, status=400)
+            invalidate_user(user['username'], update_data['username'])
             
             return JsonResponse(update_data)
         
@@ -313,131 +460,163 @@ def profile_api(request):
             return JsonResponse({'error': 'Method not allowed'}, status=405)
             
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=401)
+        return JsonResponse({'error': str(e)}, status=500)
 
 @csrf_exempt
 def syllabus_list_api(request):
+    """
+    Список силлабусов. Без limit/after возвращает все документы, как раньше;
+    с limit — страницу и курсор next_after для следующего запроса.
+    fields=id,roadmap.subject ограничивает набор полей.
+    """
     if request.method == 'GET':
-        syllabus = list(db['syllabus'].find())
-        for item in syllabus:
-            item['_id'] = str(item['_id'])
-            # Преобразуем дату в строку для фронта
-            if 'upload_date' in item:
-                item['upload_date'] = str(item['upload_date'])
-        return JsonResponse({'syllabuses': syllabus}, safe=False)
+        try:
+            after, limit, projection = parse_page_params(request.GET, SYLLABUS_LIST_FIELDS)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        try:
+            documents = prefetch(keyset_cursor(db['syllabus'], {}, after, limit, projection))
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+        return StreamingHttpResponse(stream_json_page(documents, 'syllabuses', limit), content_type='application/json')
     return JsonResponse({'error': 'GET required'}, status=405)
 
 @csrf_exempt
 def syllabus_search(request):
-    """API для поиска силлабусов"""
+    """API для поиска силлабусов: ранжированный полнотекстовый поиск с подсветкой и страницами"""
     if request.method == 'GET':
         query = request.GET.get('q', '').strip()
         if not query:
             return JsonResponse({'results': []})
-        
+
         try:
-            # Поиск по названию предмета и описанию
-            search_filter = {
-                '$or': [
-                    {'roadmap.subject.label': {'$regex': query, '$options': 'i'}},
-                    {'roadmap.subject.description': {'$regex': query, '$options': 'i'}},
-                ]
-            }
-            
-            syllabuses = list(db['syllabus'].find(search_filter).limit(20))
-            results = []
-            
-            for syllabus in syllabuses:
-                results.append({
-                    'id': syllabus['id'],
-                    'title': syllabus['roadmap']['subject']['label'],
-                    'description': syllabus['roadmap']['subject']['description'],
-                    'upload_date': str(syllabus.get('upload_date', '')),
-                    'processed': syllabus.get('processed', False)
-                })
-            
-            return JsonResponse({'results': results})
-            
+            page = int(request.GET.get('page', 1))
+            limit = int(request.GET.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return JsonResponse({'error': 'page и limit должны быть числами'}, status=400)
+
+        try:
+            return JsonResponse(search_syllabi(db, query, page, limit, request.GET.get('mode')))
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'GET required'}, status=405)
+
+@csrf_exempt
+def syllabus_catalog_api(request):
+    """API каталога с фильтрами: дата загрузки, обработка, число недель, тема, число записавшихся"""
+    if request.method == 'GET':
+        try:
+            return JsonResponse(faceted_catalog(db, request.GET))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({'error': 'GET required'}, status=405)
+
+@csrf_exempt
+def syllabus_autocomplete(request):
+    """API подсказок для строки поиска: предметы, темы недель и подтемы по префиксу"""
+    if request.method == 'GET':
+        prefix = request.GET.get('q', '')
+        try:
+            limit = int(request.GET.get('limit', DEFAULT_SUGGESTIONS))
+        except ValueError:
+            return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+        try:
+            return JsonResponse({'suggestions': suggest(db, prefix, limit)})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
-    
     return JsonResponse({'error': 'GET required'}, status=405)
 
 @csrf_exempt
+@jwt_required
+def my_courses_api(request):
+    """
+    Карточки курсов пользователя с прогрессом: название, описание, число тем и пройденных.
+    ?include=weeks добавляет прогресс по неделям, ?include=roadmap — полный roadmap курса.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'GET required'}, status=405)
+    include = {part.strip() for part in request.GET.get('include', '').split(',')}
+    try:
+        courses = enrolled_courses(db, request.auth_user['username'], include_roadmap='roadmap' in include,
+                                   include_weeks='weeks' in include)
+        return JsonResponse({'courses': courses})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@jwt_required
 def user_syllabuses_api(request):
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return JsonResponse({'error': 'Not authenticated'}, status=401)
-    token = auth_header.split(' ')[1]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user = MONGO_USERS_COLLECTION.find_one({'username': payload['username']})
-        if not user:
-            return JsonResponse({'error': 'User not found'}, status=404)
         if request.method == 'GET':
-            user_syllabus_ids = [item['syllabus_id'] for item in user.get('user_progress', [])]
-            syllabuses = list(db['syllabus'].find({'id': {'$in': user_syllabus_ids}})) if user_syllabus_ids else []
-            for item in syllabuses:
-                item['_id'] = str(item['_id'])
-                if 'upload_date' in item:
-                    item['upload_date'] = str(item['upload_date'])
-                # Вставляем user_progress для фронта
-                up = next((up for up in user.get('user_progress', []) if up['syllabus_id'] == item['id']), None)
-                item['user_progress'] = up if up else {}
-            return JsonResponse({'syllabuses': syllabuses, 'user': {'user_progress': user.get('user_progress', [])}}, safe=False)
-        elif request.method == 'POST':
-            data = json.loads(request.body)
-            syllabus_id = data.get('syllabus_id')
-            if not syllabus_id:
-                return JsonResponse({'error': 'syllabus_id required'}, status=400)
-            # Добавить syllabus_id в user_progress, если его там нет
-            user_progress = user.get('user_progress', [])
-            if not any(item['syllabus_id'] == syllabus_id for item in user_progress):
-                user_progress.append({'syllabus_id': syllabus_id, 'progress': 0, 'tests': {}})
-                MONGO_USERS_COLLECTION.update_one({'username': user['username']}, {'$set': {'user_progress': user_progress}})
+            # Силлабусы вместе с прогрессом одним aggregate; полный roadmap нужен старым экранам
+            courses = enrolled_courses(db, request.auth_user['username'], include_roadmap=True)
+            return JsonResponse({'syllabuses': courses,
+                                 'user': {'user_progress': [course['user_progress'] for course in courses]}})
+        if request.method not in ('POST', 'PATCH', 'DELETE'):
+            return JsonResponse({'error': 'Method not allowed'}, status=405)
+        # Прогресс меняется точечными атомарными операциями над одной записью user_progress,
+        # чтобы одновременные запросы с сайта и из приложения не затирали друг друга
+        username = request.auth_user['username']
+        data = json.loads(request.body)
+        syllabus_id = data.get('syllabus_id')
+        if not syllabus_id:
+            return JsonResponse({'error': 'syllabus_id required'}, status=400)
+        if request.method == 'POST':
+            enroll(db, username, syllabus_id)
             return JsonResponse({'status': 'ok'})
         elif request.method == 'PATCH':
-            data = json.loads(request.body)
-            syllabus_id = data.get('syllabus_id')
+            # Число подтем берётся из статистики, посчитанной при загрузке силлабуса
+            stats = get_stats(db, syllabus_id)
+            total = stats['total_subtopics'] if stats else 0
+            if 'add_topics' in data or 'remove_topics' in data:
+                # Изменения относительно текущего состояния: отметить / снять отметку с тем
+                add = data.get('add_topics') or []
+                remove = data.get('remove_topics') or []
+                entry = change_completed_topics(db, username, syllabus_id, add, remove, total)
+                if entry is None:
+                    enroll(db, username, syllabus_id, [topic for topic in add if topic not in remove], total)
+                    entry = change_completed_topics(db, username, syllabus_id, add, remove, total)
+                return JsonResponse({'status': 'ok', 'user_progress': entry,
+                                     'weeks': week_progress(stats, entry and entry.get('completed_topics'))})
+            # Полный список пройденных тем (старые клиенты) заменяет список только этого курса
             completed_topics = data.get('completed_topics', [])
-            if not syllabus_id:
-                return JsonResponse({'error': 'syllabus_id required'}, status=400)
-            user_progress = user.get('user_progress', [])
-            updated = False
-            # Получаем реальное количество тем из базы
-            syllabus = db['syllabus'].find_one({'id': syllabus_id})
-            total = 1
-            if syllabus and 'roadmap' in syllabus and 'subtopics' in syllabus['roadmap']:
-                total = len(syllabus['roadmap']['subtopics'])
-            for item in user_progress:
-                if item['syllabus_id'] == syllabus_id:
-                    item['completed_topics'] = completed_topics
-                    item['progress'] = round((len(completed_topics) / total) * 100) if total else 0
-                    updated = True
-            if not updated:
-                user_progress.append({'syllabus_id': syllabus_id, 'completed_topics': completed_topics, 'progress': 0, 'tests': {}})
-            MONGO_USERS_COLLECTION.update_one({'username': user['username']}, {'$set': {'user_progress': user_progress}})
+            if not set_completed_topics(db, username, syllabus_id, completed_topics, total):
+                if not enroll(db, username, syllabus_id, completed_topics, total):
+                    set_completed_topics(db, username, syllabus_id, completed_topics, total)
             return JsonResponse({'status': 'ok'})
-        elif request.method == 'DELETE':
-            # Новый метод для отписки от курса
-            data = json.loads(request.body)
-            syllabus_id = data.get('syllabus_id')
-            if not syllabus_id:
-                return JsonResponse({'error': 'syllabus_id required'}, status=400)
-            
-            user_progress = user.get('user_progress', [])
-            # Удаляем курс из прогресса пользователя
-            user_progress = [item for item in user_progress if item['syllabus_id'] != syllabus_id]
-            
-            MONGO_USERS_COLLECTION.update_one(
-                {'username': user['username']}, 
-                {'$set': {'user_progress': user_progress}}
-            )
-            return JsonResponse({'status': 'ok', 'message': 'Unsubscribed successfully'})
         else:
-            return JsonResponse({'error': 'Method not allowed'}, status=405)
+            # Отписка от курса
+            unenroll(db, username, syllabus_id)
+            return JsonResponse({'status': 'ok', 'message': 'Unsubscribed successfully'})
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=401)
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@jwt_required
+def progress_sync_api(request):
+    """
+    Синхронизация прогресса, накопленного в приложении офлайн: пакет изменений
+    {'changes': [{'syllabus_id', 'topic_id', 'completed', 'ts'}]} по всем курсам
+    применяется одним bulk_write (по каждой теме побеждает более позднее изменение),
+    в ответе — актуальный прогресс всех курсов пользователя.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Ожидается объект с полем changes')
+        changes = parse_sync_changes(data.get('changes', []), settings.PROGRESS_SYNC_MAX_CHANGES)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        result = sync_progress(db, request.auth_user['username'], changes)
+        return JsonResponse({'status': 'ok', 'server_time': int(time.time() * 1000), **result})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
 
 @csrf_exempt
 def gpt_generate_test(request):
@@ -509,20 +688,13 @@ def gpt_check_test(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 @csrf_exempt
+@jwt_required
 def upload_avatar(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return JsonResponse({'error': 'Not authenticated'}, status=401)
-    
-    token = auth_header.split(' ')[1]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user = MONGO_USERS_COLLECTION.find_one({'username': payload['username']})
-        if not user:
-            return JsonResponse({'error': 'User not found'}, status=404)
+        user = request.auth_user
         
         if 'avatar' not in request.FILES:
             return JsonResponse({'error': 'No file uploaded'}, status=400)
@@ -549,6 +721,7 @@ def upload_avatar(request):
             {'username': user['username']},
             {'$set': {'avatar': avatar_url}}
         )
+        invalidate_user(user['username'])
         
         return JsonResponse({'avatar_url': avatar_url})
         
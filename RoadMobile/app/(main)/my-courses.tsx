@@ -32,7 +32,7 @@ export default function MyCoursesScreen() {
         return;
       }
 
-      const response = await fetch(`${API_BASE_URL}/api/user-syllabuses/`, {
+      const response = await fetch(`${API_BASE_URL}/api/my-courses/`, {
         headers: { 
           'Authorization': `Bearer ${token}`,
           'Accept': 'application/json',
@@ -41,21 +41,14 @@ export default function MyCoursesScreen() {
 
       if (response.ok) {
         const data = await response.json();
-        const userProgress = data.user?.user_progress || [];
-        const coursesWithStats = data.syllabuses.map((s: any) => {
-          const up = userProgress.find((up: any) => up.syllabus_id === s.id);
-          const totalTopics = s.roadmap?.subtopics?.length || 0;
-          const completedTopics = up?.completed_topics?.length || 0;
-          
-          return {
-            id: s.id,
-            title: s.roadmap.subject.label,
-            description: s.roadmap.subject.description,
-            progress: up?.progress || 0,
-            totalTopics,
-            completedTopics,
-          };
-        });
+        const coursesWithStats = data.courses.map((c: any) => ({
+          id: c.id,
+          title: c.title,
+          description: c.description,
+          progress: c.progress || 0,
+          totalTopics: c.total_topics || 0,
+          completedTopics: c.completed_count || 0,
+        }));
         setCourses(coursesWithStats);
       }
     } catch (e) {
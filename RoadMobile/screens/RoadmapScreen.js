@@ -5,6 +5,7 @@ import AsyncStorage from '@react-native-async-storage/async-storage';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { LinearGradient } from 'expo-linear-gradient';
 import { API_BASE_URL } from '../config/api';
+import { flushProgress, queueTopicChange, withPendingTopics } from '../services/progressSync';
 
 export default function RoadmapScreen() {
   const router = useRouter();
@@ -53,6 +54,14 @@ export default function RoadmapScreen() {
       try {
         const token = await AsyncStorage.getItem('token');
         if (!token) return;
+
+        // Сначала отправляем отметки, сделанные без сети; ответ уже содержит прогресс с сервера
+        const syncedCourses = await flushProgress();
+        const synced = syncedCourses?.find(c => String(c.syllabus_id) === String(subjectId));
+        if (synced) {
+          await applyProgress(synced.completed_topics, synced.progress);
+          return;
+        }
         
         const response = await fetch(`${API_BASE_URL}/api/user-syllabuses/`, {
           headers: { 
@@ -65,14 +74,12 @@ export default function RoadmapScreen() {
         if (data && data.syllabuses) {
           const syllabus = data.syllabuses.find(s => String(s.id) === String(subjectId));
           if (syllabus && syllabus.user_progress) {
-            setCompletedTopics(syllabus.user_progress.completed_topics || []);
-            setUserProgress(syllabus.user_progress.progress || 0);
+            await applyProgress(syllabus.user_progress.completed_topics, syllabus.user_progress.progress);
           } else {
             const user = data.user;
             if (user && user.user_progress) {
               const up = user.user_progress.find(up => String(up.syllabus_id) === String(subjectId));
-              setCompletedTopics(up?.completed_topics || []);
-              setUserProgress(up?.progress || 0);
+              await applyProgress(up?.completed_topics, up?.progress);
             }
           }
         }
@@ -91,32 +98,32 @@ export default function RoadmapScreen() {
 
   const isTopicCompleted = (topicId) => completedTopics.includes(topicId);
 
+  // Состояние с сервера дополняется отметками, которые ещё ждут отправки в очереди
+  const applyProgress = async (serverTopics, serverProgress) => {
+    const topics = await withPendingTopics(subjectId, serverTopics);
+    setCompletedTopics(topics);
+    const pendingChanged = topics.length !== (serverTopics || []).length
+      || topics.some(topic => !(serverTopics || []).includes(topic));
+    if (pendingChanged && roadmap?.subtopics?.length) {
+      setUserProgress(Math.round((topics.length / roadmap.subtopics.length) * 100));
+    } else {
+      setUserProgress(serverProgress || 0);
+    }
+  };
+
   const handleTopicComplete = async (topicId) => {
     try {
-      const token = await AsyncStorage.getItem('token');
-      if (!token) return;
-
-      const newCompletedTopics = [...completedTopics, topicId];
+      const newCompletedTopics = completedTopics.includes(topicId) ? completedTopics : [...completedTopics, topicId];
       setCompletedTopics(newCompletedTopics);
-      
-      // Обновляем прогресс на сервере
-      await fetch(`${API_BASE_URL}/api/user-syllabuses/`, {
-        method: 'PATCH',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json',
-          'Accept': 'application/json',
-        },
-        body: JSON.stringify({
-          syllabus_id: subjectId,
-          completed_topics: newCompletedTopics
-        })
-      });
-
-      // Пересчитываем прогресс
       const totalTopics = roadmap?.subtopics?.length || 1;
-      const newProgress = Math.round((newCompletedTopics.length / totalTopics) * 100);
-      setUserProgress(newProgress);
+      setUserProgress(Math.round((newCompletedTopics.length / totalTopics) * 100));
+
+      // Отметка ставится в очередь и отправляется вместе с накопленными офлайн изменениями
+      const courses = await queueTopicChange(subjectId, topicId, true);
+      const synced = courses?.find(c => String(c.syllabus_id) === String(subjectId));
+      if (synced) {
+        await applyProgress(synced.completed_topics, synced.progress);
+      }
       
       Alert.alert('Успех!', 'Тема отмечена как завершённая');
     } catch (e) {
@@ -0,0 +1,106 @@
+import AsyncStorage from '@react-native-async-storage/async-storage';
+import { API_BASE_URL } from '../config/api';
+
+// Очередь изменений прогресса: отметки тем сохраняются на устройстве и отправляются
+// на сервер одним запросом, в том числе накопленные без сети.
+const QUEUE_KEY = 'progressSyncQueue';
+const MAX_BATCH = 1000;
+
+// Все чтения-изменения очереди выполняются по одному, иначе запись из одного места
+// может затереть изменение, добавленное в другом
+let queueLock = Promise.resolve();
+let flushing = null;
+let flushAgain = false;
+
+function withQueue(fn) {
+  const run = queueLock.then(async () => {
+    let queue;
+    try {
+      queue = JSON.parse(await AsyncStorage.getItem(QUEUE_KEY)) || [];
+    } catch (e) {
+      queue = [];
+    }
+    const { queue: updated, result } = await fn(queue);
+    if (updated) await AsyncStorage.setItem(QUEUE_KEY, JSON.stringify(updated));
+    return result;
+  });
+  queueLock = run.catch(() => {});
+  return run;
+}
+
+export async function queueTopicChange(syllabusId, topicId, completed = true) {
+  await withQueue(queue => ({
+    queue: [...queue, {
+      id: `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+      syllabus_id: syllabusId,
+      topic_id: topicId,
+      completed,
+      ts: Date.now(),
+    }],
+  }));
+  return flushProgress();
+}
+
+// Накладывает ещё не отправленные отметки курса на список пройденных тем с сервера
+export async function withPendingTopics(syllabusId, completedTopics) {
+  const pending = await withQueue(queue => ({ result: queue }));
+  const topics = new Set(completedTopics || []);
+  pending
+    .filter(change => String(change.syllabus_id) === String(syllabusId))
+    .forEach(change => (change.completed ? topics.add(change.topic_id) : topics.delete(change.topic_id)));
+  return [...topics];
+}
+
+// Отправляет накопленные изменения; возвращает прогресс всех курсов с сервера
+// или null, если отправить не удалось (изменения останутся в очереди).
+// Изменения, добавленные во время отправки, уходят следующим запросом до завершения промиса.
+export function flushProgress() {
+  if (flushing) {
+    flushAgain = true;
+    return flushing;
+  }
+  flushing = (async () => {
+    let courses = null;
+    do {
+      flushAgain = false;
+      const sent = await sendQueue();
+      if (sent === null) break;
+      courses = sent.courses || courses;
+    } while (flushAgain);
+    return courses;
+  })().finally(() => { flushing = null; });
+  return flushing;
+}
+
+// { courses } после отправки (courses пуст, если отправлять было нечего) или null при ошибке сети/сервера
+async function sendQueue() {
+  const token = await AsyncStorage.getItem('token');
+  if (!token) return null;
+  const batch = (await withQueue(queue => ({ result: queue }))).slice(0, MAX_BATCH);
+  if (batch.length === 0) return { courses: null };
+  const sentIds = new Set(batch.map(change => change.id));
+  const dropSent = () => withQueue(queue => ({ queue: queue.filter(change => !sentIds.has(change.id)) }));
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/progress/sync/`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+      },
+      body: JSON.stringify({ changes: batch.map(({ id, ...change }) => change) }),
+    });
+    if (response.status >= 400 && response.status < 500 && response.status !== 401 && response.status !== 403) {
+      // Сервер отклонил пакет целиком — повтор его не исправит, иначе очередь не сдвинется никогда
+      console.warn('Пакет прогресса отклонён сервером:', response.status);
+      await dropSent();
+      return { courses: null };
+    }
+    if (!response.ok) return null;
+    const data = await response.json();
+    await dropSent();
+    return { courses: data.courses };
+  } catch (e) {
+    return null;
+  }
+}